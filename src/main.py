@@ -5,6 +5,8 @@ from spotipy.oauth2 import SpotifyClientCredentials
 from spotipy.oauth2 import SpotifyOAuth
 import spotipy_api_extract_engine as spse
 import spotify_dataframe_functions as sdf
+import spotify_api_cache as spac
+import spotify_enrichment_job as sej
 
 
 load_dotenv()
@@ -52,8 +54,14 @@ track_id_values = df['track_id'].head().copy()
 #df_test = sdf.filter_spotify_data(df, 'track_popularity', 75)
 #df_test = sdf.filter_spotify_data(df, 'track_genre', 'edm').head(1000)
 
-#Apply the function for each track_id in the DataFrame and create a new column 'release_date' for each track
-#df_test['release_date'] = df_test['track_id'].apply(lambda x: spse.get_track_release_date(sp, x))
+#Fetch the release dates in batches of 50 track ids and create a new column 'release_date' for each track
+#Release dates already fetched (previous runs/exports) are served from the local cache
+#api_cache = spac.open_api_cache()
+#spac.seed_from_csv(api_cache, 'dataset_spotify_with_release_dates.csv')
+#df_test = spse.add_release_dates(df_test, sp, cache=api_cache)
+
+#Large backfills: checkpointed after each batch, rerun the same job name to resume after a crash
+#df_test = sej.run_release_date_job(sp, df_test, job_name='release_dates_edm', cache=api_cache)
 #print(df_test[['track_id', 'release_date']])
 
 #sdf.export_spotify_data(df_test, 'dataset_spotify_with_release_dates_edm.csv')
@@ -0,0 +1,149 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Path to project root (.. from src/)
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+api_cache_path = ROOT_DIR / "dataset" / "cache" / "spotify_api_cache.sqlite"
+
+# How long a looked up value stays valid
+DEFAULT_TTL = 90 * 24 * 3600
+# How long a "not found" answer is kept before asking the API again
+NEGATIVE_TTL = 7 * 24 * 3600
+
+# Namespaces of the cached lookups
+TRACK_RELEASE_DATE = 'track_release_date'
+ALBUM_RELEASE_DATE = 'album_release_date'
+# ('album_name', 'track_artist') hint -> album id
+ALBUM_HINT = 'album_hint'
+
+# SQLite limits the number of '?' in one statement
+_MAX_SQL_VARIABLES = 500
+
+_lock = threading.Lock()
+
+# namespace -> {'hits', 'misses'} of get_cached in this process
+cache_stats = {}
+
+
+def open_api_cache(path=api_cache_path) -> sqlite3.Connection:
+    """
+    Open (creating it if needed) the SQLite cache of Spotify API lookups.
+
+    Parameters:
+    path (str | Path): The SQLite file.
+
+    Returns:
+    sqlite3.Connection: The connection, usable from several threads.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS api_cache (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        )
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def get_cached(conn: sqlite3.Connection, namespace: str, keys) -> dict:
+    """
+    Fresh cached values of the given keys.
+
+    Parameters:
+    conn (sqlite3.Connection): The cache connection.
+    namespace (str): The kind of lookup (e.g. TRACK_RELEASE_DATE).
+    keys (iterable): The keys to look up.
+
+    Returns:
+    dict: key -> value for the keys found and not expired. A None value is a cached
+    "not found" (negative) answer; missing keys were never looked up or expired.
+    """
+    keys = list(dict.fromkeys(keys))
+    now = time.time()
+    cached = {}
+    with _lock:
+        for i in range(0, len(keys), _MAX_SQL_VARIABLES):
+            batch = keys[i:i + _MAX_SQL_VARIABLES]
+            rows = conn.execute(
+                f"SELECT key, value FROM api_cache WHERE namespace = ? AND expires_at > ? "
+                f"AND key IN ({','.join('?' * len(batch))})",
+                [namespace, now, *batch]
+            ).fetchall()
+            for key, value in rows:
+                cached[key] = None if value is None else json.loads(value)
+        stats = cache_stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+        stats['hits'] += len(cached)
+        stats['misses'] += len(keys) - len(cached)
+    return cached
+
+
+def set_cached(conn: sqlite3.Connection, namespace: str, items: dict, ttl: float = DEFAULT_TTL,
+               negative_ttl: float = NEGATIVE_TTL) -> None:
+    """
+    Store looked up values; None values are stored as negative answers with negative_ttl.
+
+    Parameters:
+    conn (sqlite3.Connection): The cache connection.
+    namespace (str): The kind of lookup.
+    items (dict): key -> value (JSON serializable, or None for "not found").
+    ttl (float): Validity of the values, in seconds.
+    negative_ttl (float): Validity of the negative answers, in seconds.
+    """
+    now = time.time()
+    rows = [
+        (namespace, key, None if value is None else json.dumps(value),
+         now + (negative_ttl if value is None else ttl))
+        for key, value in items.items()
+    ]
+    with _lock:
+        conn.executemany("INSERT OR REPLACE INTO api_cache VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+
+
+def purge_expired(conn: sqlite3.Connection) -> int:
+    """
+    Delete the expired entries.
+
+    Returns:
+    int: Number of deleted entries.
+    """
+    with _lock:
+        deleted = conn.execute("DELETE FROM api_cache WHERE expires_at <= ?", [time.time()]).rowcount
+        conn.commit()
+    return deleted
+
+
+def seed_from_csv(conn: sqlite3.Connection, file_path, key_column: str = 'track_id',
+                  value_column: str = 'release_date', namespace: str = TRACK_RELEASE_DATE) -> int:
+    """
+    Fill the cache with values already fetched in a previous export
+    (e.g. dataset_spotify_with_release_dates.csv).
+
+    Parameters:
+    conn (sqlite3.Connection): The cache connection.
+    file_path (str | Path): The CSV export.
+    key_column (str): Column with the keys.
+    value_column (str): Column with the values; empty values are skipped.
+    namespace (str): The kind of lookup.
+
+    Returns:
+    int: Number of seeded entries.
+    """
+    df = pd.read_csv(file_path, usecols=[key_column, value_column], dtype=str).dropna()
+    df = df.drop_duplicates(subset=key_column)
+    set_cached(conn, namespace, dict(zip(df[key_column], df[value_column])))
+    return len(df)
@@ -0,0 +1,72 @@
+import sys
+import time
+
+import spotify_cube as scube
+import spotify_dataframe_functions as sdf
+import spotify_embeddings as semb
+import spotify_fingerprint as sfp
+
+
+def append_spotify_data(delta_path) -> dict:
+    """
+    Upsert a delta file of new/updated tracks into the prepared dataset, without a full rebuild.
+
+    Only the delta rows go through the preparation (load_delta), they are upserted into the
+    current snapshot by (track_id, track_genre), and the derived artefacts are updated
+    from the row diff:
+    - the snapshot is saved under the new dataset fingerprint (the delta is recorded in
+      the deltas manifest, so a rebuild from the CSV replays it);
+    - the stored data cube only rebuilds the cells of the genres that changed;
+    - the stored t-SNE embedding only places the new tracks and the ones whose audio
+      features changed;
+    - the popularity models are keyed by the content of their segment
+      (spotify_model_registry), so only the models of the changed genres are retrained.
+    The filter context, the search indexes and the similarity index are rebuilt when the
+    dashboard loads the new version (they take seconds).
+
+    Parameters:
+    delta_path (str | Path): CSV of new/updated rows (raw or prepared columns).
+
+    Returns:
+    dict: Rows read, added, updated and unchanged, the changed genres, the new fingerprint
+    and the time taken.
+    """
+    start_time = time.time()
+    delta_hash = sfp.file_hash(delta_path)
+    if any(delta['hash'] == delta_hash for delta in sdf.get_applied_deltas()):
+        print(f"{delta_path} was already applied")
+        return {'skipped': True, 'fingerprint': sdf.get_dataset_fingerprint()}
+
+    previous_fingerprint = sdf.get_dataset_fingerprint()
+    df = sdf.prepare_spotify_data()
+    delta = sdf.load_delta(delta_path, list(df.columns))
+    updated, diff = sdf.upsert_spotify_data(df, delta)
+
+    sdf.record_delta(delta_path, len(delta))
+    fingerprint = sdf.get_dataset_fingerprint()
+    sdf.save_snapshot(updated, fingerprint)
+
+    genres = sfp.affected_values(df, updated, diff, 'track_genre')
+    cube = scube.load_data_cube(previous_fingerprint)
+    if cube is not None:
+        scube.save_data_cube(scube.update_data_cube(cube, updated, genres), fingerprint)
+    semb.update_tsne_embedding(df, updated, diff, previous_fingerprint, fingerprint)
+
+    stats = {
+        'rows_read': len(delta),
+        'rows_added': len(diff['added']),
+        'rows_updated': len(diff['changed']),
+        'rows_unchanged': len(delta) - len(diff['added']) - len(diff['changed']),
+        'genres': sorted(genres),
+        'fingerprint': fingerprint,
+        'elapsed_sec': time.time() - start_time,
+    }
+    print(f"Applied {delta_path}: {stats['rows_added']} added, {stats['rows_updated']} updated, "
+          f"{stats['rows_unchanged']} unchanged in {stats['elapsed_sec']:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    # python src/spotify_append.py new_tracks.csv
+    for path in sys.argv[1:]:
+        append_spotify_data(path)
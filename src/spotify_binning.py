@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+
+# Range of the Spotify audio features that are normalized between 0 and 1
+UNIT_RANGE = (0.0, 1.0)
+
+
+def regular_edges(start: float, end: float, n_bins: int) -> np.ndarray:
+    return np.linspace(start, end, n_bins + 1)
+
+
+def bin_centers(edges: np.ndarray) -> np.ndarray:
+    return (edges[:-1] + edges[1:]) / 2
+
+
+def bin_index(values, edges: np.ndarray) -> np.ndarray:
+    """
+    Bin of each value for regular edges, -1 outside of them.
+
+    Same convention as np.histogram: bins are [left, right) except the last one, [left, right].
+    """
+    values = np.asarray(values, dtype='float64')
+    n_bins = len(edges) - 1
+    width = (edges[-1] - edges[0]) / n_bins
+    index = np.floor((values - edges[0]) / width).astype(np.int64)
+    index[values == edges[-1]] = n_bins - 1
+    index[(index < 0) | (index >= n_bins) | np.isnan(values)] = -1
+    return index
+
+
+def histogram_1d(values, edges: np.ndarray, weights=None) -> dict:
+    """
+    Count (and optionally sum weights) per bin in one bincount pass.
+
+    Parameters:
+    values (array-like): The binned values.
+    edges (np.ndarray): Regular bin edges (see regular_edges).
+    weights (array-like): Optional values summed and averaged per bin.
+
+    Returns:
+    dict: 'edges', 'centers', 'counts' and, with weights, 'sums' and 'means' (NaN for empty bins).
+    """
+    index = bin_index(values, edges)
+    keep = index >= 0
+    n_bins = len(edges) - 1
+    result = {
+        'edges': edges,
+        'centers': bin_centers(edges),
+        'counts': np.bincount(index[keep], minlength=n_bins),
+    }
+    if weights is not None:
+        weights = np.asarray(weights, dtype='float64')[keep]
+        result['sums'] = np.bincount(index[keep], weights=weights, minlength=n_bins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['means'] = np.where(result['counts'] > 0, result['sums'] / result['counts'], np.nan)
+    return result
+
+
+def histogram_2d(x, y, x_edges: np.ndarray, y_edges: np.ndarray, weights=None) -> dict:
+    """
+    2D grid of counts (and optionally weighted sums/means), ready for go.Heatmap.
+
+    Parameters:
+    x, y (array-like): The binned values.
+    x_edges, y_edges (np.ndarray): Regular bin edges of each axis.
+    weights (array-like): Optional values summed and averaged per cell (e.g. popularity).
+
+    Returns:
+    dict: 'x_centers', 'y_centers', 'counts' and, with weights, 'sums' and 'means'.
+    The grids have shape (len(y_centers), len(x_centers)), the orientation go.Heatmap expects.
+    """
+    x_index = bin_index(x, x_edges)
+    y_index = bin_index(y, y_edges)
+    keep = (x_index >= 0) & (y_index >= 0)
+    n_x, n_y = len(x_edges) - 1, len(y_edges) - 1
+    # One flat bincount over the cells instead of a loop per bin
+    cells = y_index[keep] * n_x + x_index[keep]
+
+    result = {
+        'x_centers': bin_centers(x_edges),
+        'y_centers': bin_centers(y_edges),
+        'counts': np.bincount(cells, minlength=n_x * n_y).reshape(n_y, n_x),
+    }
+    if weights is not None:
+        weights = np.asarray(weights, dtype='float64')[keep]
+        result['sums'] = np.bincount(cells, weights=weights, minlength=n_x * n_y).reshape(n_y, n_x)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['means'] = np.where(result['counts'] > 0, result['sums'] / result['counts'], np.nan)
+    return result
+
+
+def kde_bandwidth_factor(n: int, bw_method='scott') -> float:
+    """
+    Bandwidth factor of a 1D gaussian_kde: Scott's n**(-1/5), Silverman's (3n/4)**(-1/5), or a given number.
+    """
+    if bw_method == 'scott':
+        return n ** (-1 / 5)
+    if bw_method == 'silverman':
+        return (n * 3 / 4) ** (-1 / 5)
+    return float(bw_method)
+
+
+def binned_kde(values, eval_points, bw_method='scott', n_grid: int = 2048) -> np.ndarray:
+    """
+    Gaussian KDE of 1D values evaluated at eval_points, like scipy.stats.gaussian_kde but binned.
+
+    The values are linearly binned on a regular grid and convolved with the Gaussian kernel
+    by FFT, then the density is interpolated at eval_points: O(n + n_grid log n_grid)
+    instead of O(n * len(eval_points)). The bandwidth is the same as gaussian_kde's
+    (bandwidth factor times the sample standard deviation).
+
+    Parameters:
+    values (array-like): The sample (NaN are ignored).
+    eval_points (array-like): Where the density is evaluated.
+    bw_method (str | float): 'scott', 'silverman' or a bandwidth factor, as in gaussian_kde.
+    n_grid (int): Number of grid points of the binning.
+
+    Returns:
+    np.ndarray: The density at each of eval_points.
+    """
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    eval_points = np.asarray(eval_points, dtype='float64')
+    n = len(values)
+    std = values.std(ddof=1) if n > 1 else 0.0
+    if n < 2 or std == 0:
+        raise ValueError("binned_kde needs at least 2 distinct values")
+    bandwidth = kde_bandwidth_factor(n, bw_method) * std
+
+    # Grid wide enough for the kernel tails at both ends
+    start = min(values.min(), eval_points.min()) - 4 * bandwidth
+    end = max(values.max(), eval_points.max()) + 4 * bandwidth
+    grid = np.linspace(start, end, n_grid)
+    delta = grid[1] - grid[0]
+
+    # Linear binning: each value is split between its two neighbouring grid points
+    position = (values - start) / delta
+    left = np.clip(np.floor(position).astype(np.int64), 0, n_grid - 2)
+    fraction = position - left
+    grid_counts = (np.bincount(left, weights=1 - fraction, minlength=n_grid)
+                   + np.bincount(left + 1, weights=fraction, minlength=n_grid))
+
+    half_width = min(n_grid - 1, int(np.ceil(4 * bandwidth / delta)))
+    offsets = np.arange(-half_width, half_width + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    density = fftconvolve(grid_counts, kernel, mode='same') / n
+    return np.interp(eval_points, grid, np.clip(density, 0, None))
+
+
+def bin_frame(df: pd.DataFrame, x: str, y: str, n_bins: int = 20, value_range=UNIT_RANGE, weights: str = None) -> dict:
+    """
+    histogram_2d of two columns of df over the same regular range.
+
+    Parameters:
+    df (pd.DataFrame): The (filtered) Spotify DataFrame.
+    x, y (str): The binned columns.
+    n_bins (int): Number of bins per axis.
+    value_range (tuple): (start, end) of both axes.
+    weights (str): Optional column averaged per cell.
+
+    Returns:
+    dict: See histogram_2d.
+    """
+    edges = regular_edges(value_range[0], value_range[1], n_bins)
+    return histogram_2d(
+        df[x].to_numpy(), df[y].to_numpy(), edges, edges,
+        weights=None if weights is None else df[weights].to_numpy()
+    )
+
+
+def budget_sample(df: pd.DataFrame, x: str, y: str, budget: int, keep_mask=None, n_bins: int = 64,
+                  outlier_cell_count: int = 2) -> pd.DataFrame:
+    """
+    Density-aware deterministic downsample of a scatter to at most budget points.
+
+    The points are gridded on (x, y); the rows of keep_mask (e.g. the hits) and the
+    outliers (points of cells with at most outlier_cell_count points) are kept first.
+    The rest of the budget is spread over the cells by capping the points per cell
+    (water filling), so sparse regions are kept whole and only dense ones are thinned;
+    inside a cell the rows with the smallest index hash are kept. When the kept-first
+    rows alone exceed the budget, they are thinned the same way: the rows of keep_mask
+    before the outliers, the smallest index hash first.
+
+    Parameters:
+    df (pd.DataFrame): The points.
+    x, y (str): The plotted columns.
+    budget (int): Target number of points.
+    keep_mask (array-like): Optional boolean mask of rows that must be kept.
+    n_bins (int): Grid resolution per axis.
+    outlier_cell_count (int): Cells with at most this many points are outliers, kept whole.
+
+    Returns:
+    pd.DataFrame: df itself when it fits in the budget, else the kept rows in df's order.
+    """
+    if len(df) <= budget:
+        return df
+
+    x_values = df[x].to_numpy(dtype='float64')
+    y_values = df[y].to_numpy(dtype='float64')
+    x_edges = regular_edges(np.nanmin(x_values), np.nanmax(x_values) + 1e-9, n_bins)
+    y_edges = regular_edges(np.nanmin(y_values), np.nanmax(y_values) + 1e-9, n_bins)
+    x_index, y_index = bin_index(x_values, x_edges), bin_index(y_values, y_edges)
+    # Points with a missing coordinate share one extra cell
+    cells = np.where((x_index >= 0) & (y_index >= 0), y_index * n_bins + x_index, n_bins * n_bins)
+    cell_counts = np.bincount(cells, minlength=n_bins * n_bins + 1)
+
+    keep_mask = np.zeros(len(df), dtype=bool) if keep_mask is None else np.asarray(keep_mask, dtype=bool)
+    forced = keep_mask | (cell_counts[cells] <= outlier_cell_count)
+    row_hashes = pd.util.hash_pandas_object(df.index.to_series(), index=False).to_numpy()
+
+    forced_rows = np.flatnonzero(forced)
+    if len(forced_rows) > budget:
+        order = np.lexsort((row_hashes[forced_rows], ~keep_mask[forced_rows]))
+        return df.iloc[np.sort(forced_rows[order[:budget]])]
+    remaining = budget - len(forced_rows)
+
+    # Same cap for every cell: the largest one whose total fits in the remaining budget
+    free_rows = np.flatnonzero(~forced)
+    free_counts = np.bincount(cells[free_rows], minlength=len(cell_counts))
+    low, high = 0, int(free_counts.max())
+    while low < high:
+        middle = (low + high + 1) // 2
+        if np.minimum(free_counts, middle).sum() <= remaining:
+            low = middle
+        else:
+            high = middle - 1
+
+    # Keep the rows with the smallest index hash of each cell, up to the cap
+    order = np.lexsort((row_hashes[free_rows], cells[free_rows]))
+    sorted_cells = cells[free_rows][order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_cells, sorted_cells, side='left')
+
+    kept = forced.copy()
+    kept[free_rows[order[rank < low]]] = True
+    return df.iloc[np.flatnonzero(kept)]
@@ -0,0 +1,115 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Sentinel for cache misses, so None can be cached as a value
+_MISSING = object()
+
+
+def estimate_size(value) -> int:
+    """
+    Estimate the memory used by a cached value, in bytes.
+
+    Parameters:
+    value: The cached object (DataFrame, Series, numpy array, list/tuple/dict or anything else).
+
+    Returns:
+    int: The approximated size in bytes.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        size = value.memory_usage(index=True, deep=True)
+        return int(size.sum()) if isinstance(size, pd.Series) else int(size)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class MemoryLRUCache:
+    """
+    Thread-safe LRU cache bounded by an (estimated) memory budget.
+
+    It's meant to be created once per process (e.g. with st.cache_resource) and shared
+    by all the dashboard sessions, so the cached values must be treated as read-only.
+
+    Parameters:
+    max_bytes (int): Memory budget; the least recently used entries are evicted above it.
+    max_items (int): Optional cap on the number of entries.
+    """
+
+    def __init__(self, max_bytes: int, max_items: int = None):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value, size: int = None) -> None:
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # Values bigger than the whole budget are not cached at all
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+
+    def get_or_set(self, key, build):
+        """
+        Return the cached value for key, building (and caching) it with build() on a miss.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            'items': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self.current_bytes > self.max_bytes
+            or (self.max_items is not None and len(self._entries) > self.max_items)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+
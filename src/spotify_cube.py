@@ -0,0 +1,215 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import spotify_dataframe_functions as sdf
+import spotify_filter_engine as sfe
+
+# Width of the popularity buckets of the cube (100 is a bucket of its own). A popularity
+# range filter maps exactly onto cells when its bounds fall on bucket edges.
+POPULARITY_BUCKET_WIDTH = 10
+MAX_POPULARITY = 100
+
+# Dimensions every rollup keeps, so the genre and popularity filters select their cells
+FILTER_DIMENSIONS = ['track_genre', 'popularity_bucket']
+
+# One small rollup per chart: rollup name -> dimensions kept besides FILTER_DIMENSIONS
+CUBE_ROLLUPS = {
+    'explicit': ['explicit'],                   # market share treemap, explicit ratio by genre
+    'key_mode': ['mode', 'key'],                # camelot wheel
+    'time_signature': ['time_signature'],       # time signature gauge
+    'duration_bin': ['duration_bin'],           # duration decay curve
+}
+
+# Width of the duration bins, in seconds (Duration Decay Curve)
+DURATION_BIN_SECONDS = 15
+
+# Filter steps the cube can't answer (it has no artist or track level)
+UNSUPPORTED_STEPS = {'artists', 'top_n_artists', 'tracks'}
+
+
+def popularity_bucket(popularity) -> np.ndarray:
+    return (np.asarray(popularity) // POPULARITY_BUCKET_WIDTH * POPULARITY_BUCKET_WIDTH).astype('int8')
+
+
+def build_data_cube(df: pd.DataFrame) -> dict:
+    """
+    Pre-aggregate the prepared data: count, sum and sum of squares of the popularity
+    per cell of each rollup of CUBE_ROLLUPS.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+
+    Returns:
+    dict: rollup name -> one row per non-empty cell, FILTER_DIMENSIONS and the rollup
+    dimensions plus 'count', 'popularity_sum' and 'popularity_sumsq'.
+    """
+    # Sums in 64 bits: popularity is stored as int8 and would overflow
+    popularity = df['track_popularity'].astype('float64')
+    duration_bin = (df['duration_ms'] / 1000 // DURATION_BIN_SECONDS) * DURATION_BIN_SECONDS
+    dimensions = ['track_genre', 'explicit', 'mode', 'key', 'time_signature']
+    rows = df[dimensions].assign(
+        popularity_bucket=popularity_bucket(df['track_popularity']),
+        duration_bin=duration_bin.astype('int32'),
+        popularity=popularity,
+        popularity_sq=popularity ** 2,
+    )
+
+    cube = {}
+    for name, rollup_dimensions in CUBE_ROLLUPS.items():
+        cells = rows.groupby(FILTER_DIMENSIONS + rollup_dimensions, observed=True, dropna=False, sort=False).agg(
+            count=('popularity', 'size'),
+            popularity_sum=('popularity', 'sum'),
+            popularity_sumsq=('popularity_sq', 'sum'),
+        ).reset_index()
+        cells['count'] = cells['count'].astype('int64')
+        cube[name] = cells
+    return cube
+
+
+def update_data_cube(cube: dict, df: pd.DataFrame, genres) -> dict:
+    """
+    Rebuild only the cells of some genres after the data changed (e.g. after an append);
+    the cells of the other genres are kept as they are.
+
+    Parameters:
+    cube (dict): The cube of the previous version of the data.
+    df (pd.DataFrame): The new prepared Spotify DataFrame.
+    genres (iterable): The genres whose rows changed.
+
+    Returns:
+    dict: The cube of df.
+    """
+    genres = list(genres)
+    rebuilt = build_data_cube(df[df['track_genre'].isin(genres)])
+    updated = {}
+    for name, rebuilt_cells in rebuilt.items():
+        kept = cube[name][~cube[name]['track_genre'].isin(genres)]
+        # Same categories on both sides, so the categorical dimensions survive the concat
+        kept = kept.assign(**{
+            column: kept[column].cat.set_categories(rebuilt_cells[column].cat.categories)
+            for column in rebuilt_cells.columns if isinstance(rebuilt_cells[column].dtype, pd.CategoricalDtype)
+        })
+        updated[name] = pd.concat([kept, rebuilt_cells], ignore_index=True)
+    return updated
+
+
+def get_cube_path(fingerprint: str, name: str):
+    return sdf.cache_dir / f"cube_{fingerprint}_{name}.arrow"
+
+
+def save_data_cube(cube: dict, fingerprint: str) -> None:
+    """
+    Store the rollups of a dataset fingerprint as Arrow IPC files and remove the stale ones.
+    """
+    sdf.cache_dir.mkdir(parents=True, exist_ok=True)
+    cube_paths = []
+    for name, cells in cube.items():
+        cube_path = get_cube_path(fingerprint, name)
+        tmp_path = cube_path.with_suffix(f".{os.getpid()}.tmp")
+        feather.write_feather(pa.Table.from_pandas(cells, preserve_index=False), tmp_path)
+        os.replace(tmp_path, cube_path)
+        cube_paths.append(cube_path)
+    for old_path in sdf.cache_dir.glob("cube_*.arrow"):
+        if old_path not in cube_paths:
+            old_path.unlink(missing_ok=True)
+
+
+def load_data_cube(fingerprint: str):
+    """
+    The stored cube of a dataset fingerprint, None if a rollup is missing/unreadable.
+    """
+    try:
+        return {name: feather.read_feather(get_cube_path(fingerprint, name)) for name in CUBE_ROLLUPS}
+    except Exception:
+        return None
+
+
+def get_data_cube(df: pd.DataFrame, fingerprint: str) -> dict:
+    """
+    The cube of the dataset identified by fingerprint, built once and stored on disk
+    (spotify_append updates it incrementally when tracks are added).
+    """
+    cube = load_data_cube(fingerprint)
+    if cube is None:
+        cube = build_data_cube(df)
+        try:
+            save_data_cube(cube, fingerprint)
+        except Exception as e:
+            print(f"Could not save the data cube: {e}")
+    return cube
+
+
+def build_cube_context(cube: dict) -> dict:
+    """
+    Filter context of the cells of each rollup, weighted by their number of tracks, so the
+    dashboard filters (spotify_filter_engine) select cells exactly like they select rows.
+    The popularity filter compares the lower edge of the popularity buckets.
+    """
+    contexts = {}
+    for name, cells in cube.items():
+        context = sfe.build_filter_context(cells, weights=cells['count'].to_numpy())
+        context['track_popularity'] = cells['popularity_bucket'].to_numpy()
+        contexts[name] = context
+    return contexts
+
+
+def is_bucket_range(popularity_range) -> bool:
+    """
+    Whether a popularity range (min, max inclusive) is a union of whole popularity buckets.
+    """
+    low, high = popularity_range
+    return low % POPULARITY_BUCKET_WIDTH == 0 and (
+        (high + 1) % POPULARITY_BUCKET_WIDTH == 0 or high >= MAX_POPULARITY)
+
+
+def slice_cube(cube: dict, spec: dict, context: dict = None):
+    """
+    The cells of the cube matching a dashboard filter spec.
+
+    Parameters:
+    cube (dict): The data cube.
+    spec (dict): The filter spec, see spotify_filter_engine.FILTER_STEPS.
+    context (dict): Precomputed cube context (built on the fly when not given).
+
+    Returns:
+    dict | None: The cells of each rollup for the filtered view, None when the spec uses a
+    filter the cube can't answer (an artist or track filter, or a popularity range that
+    cuts through a bucket): the charts then aggregate the rows.
+    """
+    steps = dict(sfe.normalize_filter_spec(spec))
+    if any(step in UNSUPPORTED_STEPS for step in steps):
+        return None
+    if 'popularity_range' in steps and not is_bucket_range(steps['popularity_range']):
+        return None
+    if context is None:
+        context = build_cube_context(cube)
+    return {name: sfe.materialize(cells, sfe.compute_filter_mask(context[name], spec))
+            for name, cells in cube.items()}
+
+
+def rollup(cube: dict, dimensions: list) -> pd.DataFrame:
+    """
+    Aggregate the cube cells over the given dimensions.
+
+    Parameters:
+    cube (dict): The (sliced) data cube.
+    dimensions (list): The dimensions kept; the smallest rollup that has them is used.
+
+    Returns:
+    pd.DataFrame: The dimensions plus 'count', 'popularity_mean' and 'popularity_std'
+    (sample standard deviation, like pandas).
+    """
+    cells = min((cells for cells in cube.values() if set(dimensions) <= set(cells.columns)), key=len)
+    grouped = cells.groupby(dimensions, observed=True)[['count', 'popularity_sum', 'popularity_sumsq']].sum()
+    n = grouped['count']
+    mean = grouped['popularity_sum'] / n
+    variance = (grouped['popularity_sumsq'] - n * mean ** 2) / (n - 1).where(n > 1)
+    return pd.DataFrame({
+        'count': n,
+        'popularity_mean': mean,
+        'popularity_std': np.sqrt(variance.clip(lower=0)),
+    }).reset_index()
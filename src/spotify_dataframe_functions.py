@@ -1,11 +1,78 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 from pathlib import Path
 
+import spotify_fingerprint as sfp
+
 # Path to project root (.. from src/)
 ROOT_DIR = Path(__file__).resolve().parent.parent
 
 csv_path = ROOT_DIR / "dataset" / "dataset_spotify.csv"
 
+# Folder for the prepared (Arrow IPC) snapshots of the dataset
+cache_dir = ROOT_DIR / "dataset" / "cache"
+
+# Output folder of the streaming (chunked) ingestion, one Parquet partition per genre
+partitions_dir = ROOT_DIR / "dataset" / "partitioned"
+
+# Delta files (new/updated tracks) applied on top of csv_path, see spotify_append.
+# manifest.json lists them in order; they are replayed when the snapshot is rebuilt.
+deltas_dir = ROOT_DIR / "dataset" / "deltas"
+
+# Columns added by transform_spotify_data (not read from the CSV)
+DERIVED_COLUMNS = ['duration_minutes', 'popularity_category']
+
+# Columns identifying a track row; the same track_id is listed once per genre
+DEDUP_KEY_COLUMNS = ['track_id', 'track_genre']
+
+# Duplicates dropped by clean_spotify_data: None drops the rows repeated as is (every
+# column equal, the CSV 'index' included, as the pipeline always did); DEDUP_KEY_COLUMNS
+# or ['track_id'] drop the tracks listed more than once per genre / at all
+CLEAN_DEDUP_KEY = None
+
+# Columns dropped by clean_spotify_data (no values for the analysis)
+NO_VALUES_COLUMNS = ['index']
+
+# Bump when the prepared output changes for a reason the source code hash can't see
+# (e.g. a pandas upgrade that changes a default)
+PIPELINE_VERSION = 1
+
+# Dtype schema applied while parsing the CSV. Bump SCHEMA_VERSION when changing it.
+# Both the raw ('popularity', 'artists') and the renamed column names are listed, so
+# the schema also applies to already prepared exports.
+SCHEMA_VERSION = 1
+
+ARROW_STRING = "string[pyarrow]"
+AUDIO_FEATURES = ['danceability', 'energy', 'loudness', 'speechiness', 'acousticness',
+                  'instrumentalness', 'liveness', 'valence', 'tempo']
+
+SPOTIFY_SCHEMA = {
+    'index': 'int32',
+    'track_id': ARROW_STRING,
+    'artists': 'category',
+    'track_artist': 'category',
+    'album_name': ARROW_STRING,
+    'track_name': ARROW_STRING,
+    'popularity': 'int8',
+    'track_popularity': 'int8',
+    'duration_ms': 'int32',
+    'explicit': 'bool',
+    'key': 'int8',
+    'mode': 'int8',
+    'time_signature': 'int8',
+    'track_genre': 'category',
+    **{feature: 'float32' for feature in AUDIO_FEATURES},
+}
+
 #A funciton that export the dataframe to a csv file
 def export_spotify_data(df: pd.DataFrame, file_path: str) -> None:
     """
@@ -30,51 +97,130 @@ def filter_spotify_data(df: pd.DataFrame, feature: str, threshold) -> pd.DataFra
     return filtered_df
 
 
-def load_spotify_data() -> pd.DataFrame:
+def load_spotify_data(use_schema: bool = True) -> pd.DataFrame:
     """
     Load Spotify data from a CSV file into a pandas DataFrame.
 
+    With use_schema the compact dtypes of SPOTIFY_SCHEMA are applied while parsing
+    (float32 features, small ints, categorical genre/artist, Arrow-backed strings).
+
     Parameters:
-    file_path (str): The path to the CSV file containing Spotify data.
+    use_schema (bool): Whether to parse with SPOTIFY_SCHEMA instead of the pandas defaults.
 
     Returns:
     pd.DataFrame: A DataFrame containing the Spotify data.
     """
-    df = pd.read_csv(csv_path)
+    if not use_schema:
+        return pd.read_csv(csv_path)
+
+    df = pd.read_csv(csv_path, dtype=SPOTIFY_SCHEMA)
 
     return df
 
-def clean_spotify_data(df: pd.DataFrame) -> pd.DataFrame:
+def get_memory_report(df: pd.DataFrame) -> dict:
     """
-    Clean the Spotify data by handling missing values and removing duplicates.
+    Memory usage of a DataFrame: total, per row and per column (deep, index included).
 
     Parameters:
-    df (pd.DataFrame): The DataFrame containing Spotify data.
+    df (pd.DataFrame): The DataFrame to measure.
 
     Returns:
-    pd.DataFrame: A cleaned DataFrame.
+    dict: 'total_bytes', 'bytes_per_row' and 'columns' (column -> bytes).
     """
-    # Drop rows with any missing values
-    df = df.dropna()
-
-    # Drop duplicate rows
-    df = df.drop_duplicates()
-
-    # Convert necessary columns to appropriate data types
-    # df['track_album_release_date'] = pd.to_datetime(df['track_album_release_date'],  format='%Y-%m-%d', errors='coerce')
+    usage = df.memory_usage(index=True, deep=True)
+    return {
+        'total_bytes': int(usage.sum()),
+        'bytes_per_row': float(usage.sum()) / max(len(df), 1),
+        'columns': usage.astype(int).to_dict(),
+    }
+
+def compare_memory_usage() -> dict:
+    """
+    Compare the bytes per row of the prepared data parsed with the pandas defaults vs SPOTIFY_SCHEMA.
 
-    # Extract year, month, and day from 'track_album_release_date'
-    # df['release_year'] = df['track_album_release_date'].dt.year
-    # df['release_month'] = df['track_album_release_date'].dt.month
-    # df['release_day'] = df['track_album_release_date'].dt.day
+    Returns:
+    dict: The 'default' and 'schema' memory reports.
+    """
+    default_df = transform_spotify_data(clean_spotify_data(load_spotify_data(use_schema=False)))
+    schema_df = transform_spotify_data(clean_spotify_data(load_spotify_data(use_schema=True)))
+    report = {
+        'default': get_memory_report(default_df),
+        'schema': get_memory_report(schema_df),
+    }
+    print(f"Bytes per row (pandas defaults): {report['default']['bytes_per_row']:.1f}")
+    print(f"Bytes per row (schema v{SCHEMA_VERSION}): {report['schema']['bytes_per_row']:.1f}")
+    return report
+
+def clean_spotify_data(df: pd.DataFrame, dedup_key=CLEAN_DEDUP_KEY, keep: str = 'first',
+                       return_report: bool = False):
+    """
+    Clean the Spotify data by removing the rows with missing values and the duplicates.
 
-    # Dropping columns with no values for the analysis
-    no_values_columns = ['index']
-    df.drop(columns=no_values_columns, inplace=True)
+    Both conditions are computed as boolean masks over the input and the kept rows are
+    selected once, without intermediate copies of the frame. Duplicates are looked up
+    among the rows without missing values, on the dedup_key columns only.
 
-    
+    Parameters:
+    df (pd.DataFrame): The DataFrame containing Spotify data.
+    dedup_key (list): Columns identifying a duplicate, None for all the columns (see CLEAN_DEDUP_KEY).
+    keep (str): Which duplicate is kept, 'first' or 'last'.
+    return_report (bool): Also return what was dropped and the cost of each step.
 
-    return df
+    Returns:
+    pd.DataFrame: A cleaned DataFrame; with return_report, a tuple (DataFrame, report) where
+    report has 'rows_in', 'rows_out', 'dropped' (reason -> number of rows), 'dropped_labels'
+    (reason -> index labels), 'missing_by_column' and 'steps' (seconds and bytes produced).
+    """
+    steps = []
+
+    def timed(step, compute, size):
+        if not return_report:
+            return compute()
+        start_time = time.perf_counter()
+        result = compute()
+        steps.append({'step': step, 'seconds': time.perf_counter() - start_time, 'bytes': size(result)})
+        return result
+
+    # Rows with any missing value
+    def find_missing():
+        is_missing = df.isna()
+        return is_missing.any(axis=1).to_numpy(), is_missing.sum()
+    missing, missing_by_column = timed('missing', find_missing, lambda result: result[0].nbytes)
+
+    # Duplicates among the complete rows. With all the columns, only the rows sharing their
+    # 'index' value can be repeated: the other columns are compared for those rows only.
+    def find_duplicates():
+        duplicate = np.zeros(len(df), dtype=bool)
+        key = list(df.columns) if dedup_key is None else list(dedup_key)
+        candidates = ~missing
+        if dedup_key is None and 'index' in df.columns:
+            candidates &= df['index'].duplicated(keep=False).to_numpy()
+        positions = np.flatnonzero(candidates)
+        if len(positions) == 0:
+            return duplicate
+        rows = df[key] if len(positions) == len(df) else df[key].iloc[positions]
+        duplicate[positions] = rows.duplicated(keep=keep).to_numpy()
+        return duplicate
+    duplicate = timed('duplicates', find_duplicates, lambda result: result.nbytes)
+
+    # The kept rows and columns, selected in one go
+    columns = [column for column in df.columns if column not in NO_VALUES_COLUMNS]
+    dropped = missing | duplicate
+    cleaned = timed('select', lambda: df.loc[~dropped, columns] if dropped.any() else df[columns],
+                    lambda result: int(result.memory_usage(index=True, deep=True).sum()))
+
+    if not return_report:
+        return cleaned
+
+    report = {
+        'rows_in': len(df),
+        'rows_out': len(cleaned),
+        'dropped': {'missing': int(missing.sum()), 'duplicate': int(duplicate.sum())},
+        'dropped_labels': {'missing': df.index[missing], 'duplicate': df.index[duplicate]},
+        'missing_by_column': {column: int(n) for column, n in missing_by_column.items() if n},
+        'steps': steps,
+    }
+    return cleaned, report
 
 def transform_spotify_data(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -92,7 +238,7 @@ def transform_spotify_data(df: pd.DataFrame) -> pd.DataFrame:
 
 
     # Convert duration from milliseconds to minutes
-    df['duration_minutes'] = df['duration_ms'] / 60000
+    df['duration_minutes'] = (df['duration_ms'] / 60000).astype('float32')
 
     # Create a popularity category
     df['popularity_category'] = pd.cut(df['track_popularity'], 
@@ -107,27 +253,367 @@ def transform_spotify_data(df: pd.DataFrame) -> pd.DataFrame:
     # df.release_year = df.release_year.astype(int)
     # df.release_month = df.release_month.astype(int) 
     # df.release_day = df.release_day.astype(int) 
-    df.time_signature = df.time_signature.astype(int) 
+    df.time_signature = df.time_signature.astype('int8')
 
     return df
 
-def prepare_spotify_data() -> pd.DataFrame:
+def get_pipeline_fingerprint() -> str:
+    """
+    Fingerprint of the preparation code, so editing load/clean/transform invalidates the snapshots.
+
+    Returns:
+    str: The hex digest of the pipeline version and source code.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(PIPELINE_VERSION).encode())
+    digest.update(pd.__version__.encode())
+    digest.update(f"{SCHEMA_VERSION}:{sorted(SPOTIFY_SCHEMA.items())}".encode())
+    for func in [load_spotify_data, clean_spotify_data, transform_spotify_data, load_delta, upsert_spotify_data]:
+        digest.update(inspect.getsource(func).encode())
+    return digest.hexdigest()
+
+def get_applied_deltas() -> list:
+    """
+    The delta files applied on top of csv_path, oldest first.
+
+    Returns:
+    list: One dict per delta: 'file' (name in deltas_dir), 'hash', 'rows' and 'applied_at'.
     """
-    Load, clean, and transform Spotify data.
+    manifest_path = deltas_dir / "manifest.json"
+    if not manifest_path.exists():
+        return []
+    with open(manifest_path) as f:
+        return json.load(f)['deltas']
+
+def record_delta(delta_path, n_rows: int) -> dict:
+    """
+    Copy a delta file into deltas_dir and add it to the manifest, so rebuilds replay it.
 
     Parameters:
-    file_path (str): The path to the CSV file containing Spotify data.
+    delta_path (str | Path): The applied delta file.
+    n_rows (int): Number of prepared rows it contained.
+
+    Returns:
+    dict: The manifest entry of the delta.
+    """
+    deltas_dir.mkdir(parents=True, exist_ok=True)
+    deltas = get_applied_deltas()
+    delta_hash = sfp.file_hash(delta_path)
+    entry = {'file': f"{len(deltas):05d}_{delta_hash}.csv", 'hash': delta_hash,
+             'rows': n_rows, 'applied_at': time.time()}
+    shutil.copyfile(delta_path, deltas_dir / entry['file'])
+
+    manifest_path = deltas_dir / "manifest.json"
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'deltas': deltas + [entry]}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return entry
+
+def get_fingerprint_chain() -> list:
+    """
+    Fingerprints of the successive versions of the prepared dataset: the source file
+    (file hash + pipeline fingerprint) first, then one more per applied delta.
+
+    Returns:
+    list: The hex digests, the last one identifies the current prepared data.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(sfp.file_hash(csv_path).encode())
+    digest.update(get_pipeline_fingerprint().encode())
+    chain = [digest.hexdigest()]
+    for delta in get_applied_deltas():
+        chain.append(hashlib.blake2b(f"{chain[-1]}:{delta['hash']}".encode(), digest_size=16).hexdigest())
+    return chain
+
+def get_dataset_fingerprint() -> str:
+    """
+    Fingerprint of the prepared dataset: source file hash + pipeline fingerprint + applied deltas.
+
+    Returns:
+    str: The hex digest identifying the prepared data.
+    """
+    return get_fingerprint_chain()[-1]
+
+def get_snapshot_path(fingerprint: str) -> Path:
+    """
+    Path of the Arrow IPC snapshot for a given dataset fingerprint.
+    """
+    return cache_dir / f"prepared_{fingerprint}.arrow"
+
+def save_snapshot(df: pd.DataFrame, fingerprint: str) -> None:
+    """
+    Save the prepared DataFrame as an Arrow IPC (Feather v2) snapshot and remove the stale ones.
+
+    Arrow IPC is used instead of Parquet because it keeps the integer categoricals
+    ('key', 'mode') and the ordered 'popularity_category' as they are.
+
+    Parameters:
+    df (pd.DataFrame): The prepared DataFrame.
+    fingerprint (str): The dataset fingerprint the snapshot belongs to.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    snapshot_path = get_snapshot_path(fingerprint)
+
+    # Write to a temp file first so a concurrent reader never sees a half written snapshot
+    tmp_path = snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+    for old_snapshot in cache_dir.glob("prepared_*.arrow"):
+        if old_snapshot != snapshot_path:
+            old_snapshot.unlink(missing_ok=True)
+    return
+
+def load_snapshot(fingerprint: str):
+    """
+    Load the Arrow IPC snapshot for a given dataset fingerprint.
+
+    Parameters:
+    fingerprint (str): The dataset fingerprint.
+
+    Returns:
+    pd.DataFrame | None: The prepared DataFrame, or None if there's no valid snapshot.
+    """
+    snapshot_path = get_snapshot_path(fingerprint)
+    if not snapshot_path.exists():
+        return None
+    try:
+        return feather.read_feather(snapshot_path)
+    except Exception:
+        # Corrupted/unreadable snapshot, it will be rebuilt
+        return None
+
+def load_delta(delta_path, columns: list) -> pd.DataFrame:
+    """
+    Load a delta file of new/updated tracks and prepare its rows like the main CSV.
+
+    The file can be a raw extract (same columns as csv_path) or a prepared export such as
+    the release dates enrichment: the raw names are renamed, the derived columns are
+    recomputed and the columns the prepared data doesn't have ('index', 'release_date')
+    are ignored.
+
+    Parameters:
+    delta_path (str | Path): The CSV file.
+    columns (list): Columns of the prepared DataFrame the delta is applied to.
+
+    Returns:
+    pd.DataFrame: The prepared delta rows, one per key (the last one wins), with columns.
+    """
+    delta = pd.read_csv(delta_path, dtype=SPOTIFY_SCHEMA)
+    delta = delta.rename(columns={'popularity': 'track_popularity', 'artists': 'track_artist'})
+    source_columns = [column for column in columns if column not in DERIVED_COLUMNS]
+    missing = [column for column in source_columns if column not in delta.columns]
+    if missing:
+        raise ValueError(f"The delta file {delta_path} has no column {missing}")
+
+    delta = clean_spotify_data(delta[source_columns], dedup_key=DEDUP_KEY_COLUMNS, keep='last')
+    return transform_spotify_data(delta)[columns]
+
+def upsert_spotify_data(df: pd.DataFrame, delta: pd.DataFrame, key_columns=DEDUP_KEY_COLUMNS) -> tuple:
+    """
+    Overwrite the rows of df whose key is in delta and append the other rows of delta.
+
+    Updated rows keep their position and index label, new rows get the labels following
+    the last one. The rows are matched and compared by spotify_fingerprint.diff_rows (the
+    row hashes of df are memoized there); df itself is not modified.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    delta (pd.DataFrame): Prepared rows with the same columns (see load_delta).
+    key_columns (list): Columns identifying a row.
+
+    Returns:
+    tuple: (the updated DataFrame, the row diff as returned by spotify_fingerprint.diff_rows)
+    """
+    # The categories of df first, then the new ones of the delta
+    categories = {}
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and not df[column].cat.ordered:
+            current = df[column].cat.categories
+            incoming = pd.Index(delta[column].dropna().unique())
+            categories[column] = current.append(incoming.difference(current))
+    updated = df.assign(**{column: df[column].cat.set_categories(c) for column, c in categories.items()})
+    delta = delta.assign(**{column: delta[column].astype(updated[column].dtype) for column in categories})
+
+    # Matched rows whose content differs take the delta values, in place
+    delta = delta.reset_index(drop=True)
+    row_diff = sfp.diff_rows(df, delta, key_columns)
+    changed_positions = df.index.get_indexer(row_diff['changed_previous'])
+    if len(changed_positions):
+        changed_rows = delta.loc[row_diff['changed']]
+        for column in updated.columns:
+            updated.iloc[changed_positions, updated.columns.get_loc(column)] = changed_rows[column].array
+
+    added = delta.loc[row_diff['added']]
+    first_label = int(df.index.max()) + 1 if len(df) else 0
+    added.index = pd.RangeIndex(first_label, first_label + len(added))
+    updated = pd.concat([updated, added])
+
+    # Labels of the updated frame; an upsert never removes rows
+    diff = {
+        'added': added.index,
+        'removed': df.index[:0],
+        'changed': row_diff['changed_previous'],
+        'changed_previous': row_diff['changed_previous'],
+    }
+    return updated, diff
+
+def apply_deltas(df: pd.DataFrame, deltas: list) -> pd.DataFrame:
+    """
+    Replay recorded deltas (entries of get_applied_deltas) on a prepared DataFrame.
+    """
+    for delta in deltas:
+        df, _ = upsert_spotify_data(df, load_delta(deltas_dir / delta['file'], list(df.columns)))
+    return df
+
+def prepare_spotify_data(use_snapshot: bool = True) -> pd.DataFrame:
+    """
+    Load, clean, and transform Spotify data, then apply the recorded deltas.
+
+    When use_snapshot is True the prepared DataFrame is read from an Arrow IPC snapshot
+    keyed by the source file hash, the pipeline code and the applied deltas, and only
+    rebuilt when one of them changes. A snapshot of an earlier version of the data (before
+    the last deltas) is brought up to date by replaying only the missing deltas.
+
+    Parameters:
+    use_snapshot (bool): Whether to use (and refresh) the snapshot.
 
     Returns:
     pd.DataFrame: A prepared DataFrame ready for analysis.
     """
-    df = load_spotify_data()
-    df = clean_spotify_data(df)
-    df = transform_spotify_data(df)
+    deltas = get_applied_deltas()
+    if not use_snapshot:
+        df = load_spotify_data()
+        df = clean_spotify_data(df)
+        df = transform_spotify_data(df)
+        return apply_deltas(df, deltas)
+
+    chain = get_fingerprint_chain()
+    fingerprint = chain[-1]
+    df = load_snapshot(fingerprint)
+    if df is not None:
+        return df
+
+    for n_applied in range(len(chain) - 2, -1, -1):
+        df = load_snapshot(chain[n_applied])
+        if df is not None:
+            df = apply_deltas(df, deltas[n_applied:])
+            break
+    else:
+        df = prepare_spotify_data(use_snapshot=False)
+
+    try:
+        save_snapshot(df, fingerprint)
+    except Exception as e:
+        # A read-only disk shouldn't prevent the app from working
+        print(f"Could not save the prepared data snapshot: {e}")
     return df
 
 
+def prepare_spotify_data_streaming(output_dir=partitions_dir, chunksize: int = 200_000,
+                                   dedup_key=CLEAN_DEDUP_KEY, partition_column: str = 'track_genre') -> dict:
+    """
+    Load, clean, and transform the Spotify CSV chunk by chunk into a partitioned Parquet dataset.
+
+    Only one chunk is in memory at a time. Each chunk is cleaned like prepare_spotify_data
+    and its duplicates of the rows of the previous chunks are dropped with a set of
+    64-bit hashes of the dedup_key columns, so the output holds the same rows as the
+    snapshot. Each chunk is then appended to the dataset partitioned by partition_column.
+
+    Parameters:
+    output_dir (str | Path): Folder of the partitioned dataset (replaced if it exists).
+    chunksize (int): Number of CSV rows per chunk.
+    dedup_key (list): CSV columns identifying a duplicated row, None for all the columns
+                      (same meaning as in clean_spotify_data).
+    partition_column (str): Column used to partition the output.
+
+    Returns:
+    dict: Ingestion stats (rows read, dropped as missing/duplicated, written, chunks).
+    """
+    output_dir = Path(output_dir)
+    tmp_dir = output_dir.with_name(output_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    stats = {'rows_read': 0, 'rows_missing': 0, 'rows_duplicated': 0, 'rows_written': 0, 'chunks': 0}
+    seen_keys = set()
+    columns = None
+
+    for raw_chunk in pd.read_csv(csv_path, dtype=SPOTIFY_SCHEMA, chunksize=chunksize):
+        stats['rows_read'] += len(raw_chunk)
+        chunk, report = clean_spotify_data(raw_chunk, dedup_key=dedup_key, return_report=True)
+        stats['rows_missing'] += report['dropped']['missing']
+        stats['rows_duplicated'] += report['dropped']['duplicate']
+
+        # Drop the rows whose key was already seen in a previous chunk. The key is hashed
+        # on the raw rows: the clean drops the 'index' column, part of the default key.
+        key = list(raw_chunk.columns) if dedup_key is None else list(dedup_key)
+        keys = pd.util.hash_pandas_object(raw_chunk.loc[chunk.index, key], index=False).to_numpy()
+        keep = np.fromiter((k not in seen_keys for k in keys.tolist()), dtype=bool, count=len(keys))
+        seen_keys.update(keys[keep].tolist())
+        stats['rows_duplicated'] += int((~keep).sum())
+
+        chunk = transform_spotify_data(chunk[keep])
+
+        if columns is None:
+            columns = list(chunk.columns)
+        if len(chunk) > 0:
+            pq.write_to_dataset(
+                pa.Table.from_pandas(chunk, preserve_index=True),
+                tmp_dir,
+                partition_cols=[partition_column],
+                basename_template=f"chunk{stats['chunks']:05d}-{{i}}.parquet"
+            )
+        stats['rows_written'] += len(chunk)
+        stats['chunks'] += 1
+
+    # Parquet can't keep integer categoricals ('key', 'mode') nor the column order, save them
+    manifest = {
+        'columns': columns,
+        'categorical_columns': [c for c in columns or [] if c in ('key', 'mode')],
+        'partition_column': partition_column,
+        'source_hash': sfp.file_hash(csv_path),
+        'pipeline': get_pipeline_fingerprint(),
+        'stats': stats,
+    }
+    with open(tmp_dir / "_manifest.json", 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return stats
+
+def load_partitioned_spotify_data(partitions=None, input_dir=partitions_dir) -> pd.DataFrame:
+    """
+    Load the partitioned dataset written by prepare_spotify_data_streaming.
+
+    Parameters:
+    partitions (list): Values of the partition column (the genres by default) to read;
+                       None reads them all.
+    input_dir (str | Path): Folder of the partitioned dataset.
+
+    Returns:
+    pd.DataFrame: The prepared rows of the selected partitions, in the original row order.
+    """
+    input_dir = Path(input_dir)
+    with open(input_dir / "_manifest.json") as f:
+        manifest = json.load(f)
+
+    # Datasets written before the manifest recorded it are partitioned by genre
+    partition_column = manifest.get('partition_column', 'track_genre')
+    filters = [(partition_column, 'in', list(partitions))] if partitions else None
+    df = pd.read_parquet(input_dir, filters=filters)
+
+    for column in manifest['categorical_columns']:
+        df[column] = df[column].astype('category')
+    return df[manifest['columns']].sort_index()
+
+
 if __name__ == "__main__":
     file_path = 'dataset_spotify.csv'
+    #compare_memory_usage()
+    #prepare_spotify_data_streaming(chunksize=200_000)
     #prepared_data = prepare_spotify_data(file_path)
     #print(prepared_data.head())
\ No newline at end of file
@@ -0,0 +1,223 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from sklearn.manifold import TSNE
+from sklearn.neighbors import NearestNeighbors
+
+import spotify_dataframe_functions as sdf
+
+# Features projected by the "Hit Potential" t-SNE map
+TSNE_FEATURES = ['danceability', 'energy', 'valence', 'acousticness', 'loudness', 'tempo']
+
+# Neighbours used to place tracks added after the fit
+PLACEMENT_NEIGHBORS = 10
+
+# Share of the tracks of the data a previous embedding must already cover to be extended;
+# below it most tracks would be placed on a few neighbours and the map would be meaningless
+MIN_EMBEDDED_SHARE = 0.5
+
+
+def get_embedding_path(fingerprint: str):
+    return sdf.cache_dir / f"tsne_{fingerprint}.arrow"
+
+
+def _track_features(df: pd.DataFrame) -> pd.DataFrame:
+    # One row per track: the same track_id is listed once per genre with the same audio features
+    tracks = df.drop_duplicates(subset='track_id').set_index('track_id')
+    return tracks[TSNE_FEATURES].astype('float64').fillna(0)
+
+
+def compute_tsne_embedding(df: pd.DataFrame, random_state: int = 42, n_jobs: int = -1) -> pd.DataFrame:
+    """
+    Project every track of the catalog on 2 dimensions with t-SNE.
+
+    Barnes-Hut t-SNE with PCA initialization, on all the cores. Meant to be run offline
+    (see __main__), it takes minutes on the full catalog.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    random_state (int): Seed of the projection.
+    n_jobs (int): Number of threads used by the neighbours search.
+
+    Returns:
+    pd.DataFrame: 'tsne_1' and 'tsne_2' indexed by track_id, with the scaler in .attrs.
+    """
+    features = _track_features(df)
+    mean = features.mean()
+    scale = features.std(ddof=0).replace(0, 1)
+    X_scaled = ((features - mean) / scale).to_numpy()
+
+    tsne = TSNE(n_components=2, random_state=random_state, perplexity=30, init='pca',
+                method='barnes_hut', n_jobs=n_jobs)
+    projections = tsne.fit_transform(X_scaled)
+
+    embedding = pd.DataFrame(projections, index=features.index, columns=['tsne_1', 'tsne_2'])
+    embedding.attrs['scaler'] = {'mean': mean.tolist(), 'scale': scale.tolist()}
+    return embedding
+
+
+def save_embedding(embedding: pd.DataFrame, fingerprint: str) -> None:
+    """
+    Save the embedding (and its scaler) as an Arrow IPC file keyed by the dataset fingerprint.
+    """
+    sdf.cache_dir.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(embedding, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'scaler': json.dumps(embedding.attrs['scaler']).encode(),
+    })
+    embedding_path = get_embedding_path(fingerprint)
+    # A file of its own per writer: the dashboard and the precompute workers may save the same embedding
+    tmp_fd, tmp_name = tempfile.mkstemp(dir=sdf.cache_dir, prefix=embedding_path.name, suffix=".tmp")
+    os.close(tmp_fd)
+    try:
+        feather.write_feather(table, tmp_name)
+        os.replace(tmp_name, embedding_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def load_embedding(embedding_path):
+    """
+    Load a stored embedding, or None if it's missing/unreadable.
+    """
+    try:
+        table = feather.read_table(embedding_path)
+    except Exception:
+        return None
+    embedding = table.to_pandas()
+    embedding.attrs['scaler'] = json.loads(table.schema.metadata[b'scaler'])
+    return embedding
+
+
+def place_new_tracks(embedding: pd.DataFrame, df: pd.DataFrame, n_neighbors: int = PLACEMENT_NEIGHBORS) -> pd.DataFrame:
+    """
+    Add the tracks of df missing from the embedding without refitting t-SNE.
+
+    Each new track is placed at the distance-weighted average of the coordinates of its
+    nearest embedded tracks in the (scaled) feature space. Tracks no longer in df are dropped.
+
+    Parameters:
+    embedding (pd.DataFrame): The stored embedding.
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    n_neighbors (int): Number of neighbours used to place a track.
+
+    Returns:
+    pd.DataFrame: The embedding of exactly the tracks of df.
+    """
+    features = _track_features(df)
+    scaler = embedding.attrs['scaler']
+    X_scaled = (features - scaler['mean']) / scaler['scale']
+
+    known = features.index.isin(embedding.index)
+    updated = embedding.loc[features.index[known]]
+    if known.all():
+        updated.attrs['scaler'] = scaler
+        return updated
+
+    n_neighbors = min(n_neighbors, int(known.sum()))
+    nn = NearestNeighbors(n_neighbors=n_neighbors).fit(X_scaled[known].to_numpy())
+    distances, neighbors = nn.kneighbors(X_scaled[~known].to_numpy())
+    weights = 1 / (distances + 1e-6)
+    weights /= weights.sum(axis=1, keepdims=True)
+    coordinates = updated.to_numpy()
+    placed = np.einsum('ij,ijk->ik', weights, coordinates[neighbors])
+
+    new_rows = pd.DataFrame(placed, index=features.index[~known], columns=['tsne_1', 'tsne_2'])
+    updated = pd.concat([updated, new_rows])
+    updated.attrs['scaler'] = scaler
+    return updated
+
+
+def get_tsne_embedding(df: pd.DataFrame, fingerprint: str, build: bool = True):
+    """
+    The t-SNE embedding of the dataset identified by fingerprint.
+
+    Order of preference: the stored embedding of this fingerprint; the latest stored
+    embedding of a previous version of the data, extended with place_new_tracks (no
+    refit) when it already covers at least MIN_EMBEDDED_SHARE of the tracks; a full fit
+    when build is True.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    fingerprint (str): The dataset fingerprint.
+    build (bool): Whether a full t-SNE fit is allowed when nothing is stored.
+
+    Returns:
+    pd.DataFrame | None: The embedding indexed by track_id, None when not available.
+    """
+    embedding_path = get_embedding_path(fingerprint)
+    if embedding_path.exists():
+        embedding = load_embedding(embedding_path)
+        if embedding is not None:
+            return embedding
+
+    previous = sorted(sdf.cache_dir.glob("tsne_*.arrow"), key=lambda p: p.stat().st_mtime, reverse=True)
+    embedding = load_embedding(previous[0]) if previous else None
+    if embedding is not None:
+        # The projection of another dataset (few tracks in common) can't be extended
+        track_ids = df['track_id'].unique()
+        n_embedded = int(pd.Index(track_ids).isin(embedding.index).sum())
+        if n_embedded < PLACEMENT_NEIGHBORS or n_embedded < MIN_EMBEDDED_SHARE * len(track_ids):
+            embedding = None
+    if embedding is not None:
+        embedding = place_new_tracks(embedding, df)
+    elif build:
+        embedding = compute_tsne_embedding(df)
+    else:
+        return None
+
+    save_embedding(embedding, fingerprint)
+    for old_path in previous:
+        if old_path != embedding_path:
+            old_path.unlink(missing_ok=True)
+    return embedding
+
+
+def update_tsne_embedding(old_df: pd.DataFrame, df: pd.DataFrame, diff: dict,
+                          previous_fingerprint: str, fingerprint: str):
+    """
+    Carry the stored embedding of the previous version of the data over to df after an upsert.
+
+    New tracks are placed with place_new_tracks and so are the tracks whose audio features
+    changed; the other tracks keep their coordinates.
+
+    Parameters:
+    old_df (pd.DataFrame): The previous prepared DataFrame.
+    df (pd.DataFrame): The new prepared DataFrame.
+    diff (dict): The row diff between them (see spotify_fingerprint.diff_rows).
+    previous_fingerprint (str): The fingerprint of old_df.
+    fingerprint (str): The fingerprint of df.
+
+    Returns:
+    pd.DataFrame | None: The new embedding, None when old_df had no stored embedding.
+    """
+    previous_path = get_embedding_path(previous_fingerprint)
+    embedding = load_embedding(previous_path) if previous_path.exists() else None
+    if embedding is None:
+        return None
+
+    old_features = _track_features(old_df.loc[diff['changed_previous']])
+    new_features = _track_features(df.loc[diff['changed']])
+    common = new_features.index.intersection(old_features.index)
+    moved = common[(new_features.loc[common] != old_features.loc[common]).any(axis=1).to_numpy()]
+
+    scaler = embedding.attrs['scaler']
+    embedding = embedding.drop(index=moved)
+    embedding.attrs['scaler'] = scaler
+    embedding = place_new_tracks(embedding, df)
+    save_embedding(embedding, fingerprint)
+    previous_path.unlink(missing_ok=True)
+    return embedding
+
+
+if __name__ == "__main__":
+    # Offline precompute of the full catalog projection
+    prepared_df = sdf.prepare_spotify_data()
+    get_tsne_embedding(prepared_df, sdf.get_dataset_fingerprint())
@@ -0,0 +1,116 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import spotify_api_cache as spac
+import spotipy_api_extract_engine as spse
+
+# Path to project root (.. from src/)
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+jobs_dir = ROOT_DIR / "dataset" / "cache" / "enrichment_jobs"
+
+# Track ids processed (and checkpointed) together
+JOB_BATCH_SIZE = 500
+
+
+def _write_json_atomic(data: dict, file_path: Path) -> None:
+    tmp_path = file_path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, file_path)
+
+
+def load_job_results(job_dir) -> pd.DataFrame:
+    """
+    Results checkpointed so far by a job ('track_id', 'release_date').
+    """
+    results_path = Path(job_dir) / "results.csv"
+    if not results_path.exists():
+        return pd.DataFrame(columns=['track_id', 'release_date'])
+    # A crash while appending can leave a truncated last line
+    results = pd.read_csv(results_path, dtype=str, on_bad_lines='skip')
+    return results.drop_duplicates(subset='track_id', keep='last')
+
+
+def format_job_stats(stats: dict) -> str:
+    return (
+        f"{stats['tracks_done']}/{stats['tracks_total']} tracks | "
+        f"{stats['tracks_per_sec']:.1f} tracks/s | "
+        f"{stats['api_calls_per_sec']:.2f} API calls/s | "
+        f"cache hit ratio {stats['cache_hit_ratio']:.0%}"
+    )
+
+
+def run_release_date_job(sp_client, df: pd.DataFrame, job_name: str = 'release_dates',
+                         batch_size: int = JOB_BATCH_SIZE, cache=None, max_workers: int = 4,
+                         job_root=jobs_dir) -> pd.DataFrame:
+    """
+    Add release dates to df in checkpointed batches, resuming a previous run of the same job.
+
+    After each batch the fetched dates are appended to <job_root>/<job_name>/results.csv and
+    the progress/throughput is saved to state.json. Rerunning the job skips the tracks that
+    already have a date; tracks without one go through the lookup again, where the negative
+    answers of the cache (both lookup paths store them) keep the ones the API doesn't know
+    from hitting it again: only the tracks of failed requests are fetched again.
+
+    Parameters:
+    sp_client (spotipy.Spotify): The Spotify client.
+    df (pd.DataFrame): DataFrame with 'track_id' (and the album columns used by add_release_dates).
+    job_name (str): Name of the job folder, reuse it to resume.
+    batch_size (int): Number of track ids per checkpoint.
+    cache (sqlite3.Connection): Optional persistent cache from spotify_api_cache.open_api_cache.
+    max_workers (int): Number of concurrent requests.
+    job_root (str | Path): Folder holding the job folders.
+
+    Returns:
+    pd.DataFrame: A copy of df with the 'release_date' column.
+    """
+    job_dir = Path(job_root) / job_name
+    job_dir.mkdir(parents=True, exist_ok=True)
+    results_path = job_dir / "results.csv"
+
+    results = load_job_results(job_dir)
+    done_ids = set(results.loc[results['release_date'].notna(), 'track_id'])
+    all_ids = df['track_id'].dropna().unique()
+    pending_ids = [track_id for track_id in all_ids if track_id not in done_ids]
+    print(f"Job '{job_name}': {len(done_ids)} tracks already done, {len(pending_ids)} to go")
+
+    start_time = time.time()
+    start_calls = spse.api_stats['calls']
+    start_cache = dict(spac.cache_stats.get(spac.TRACK_RELEASE_DATE, {'hits': 0, 'misses': 0}))
+    stats = {'tracks_total': len(all_ids), 'tracks_done': len(done_ids)}
+
+    rows_by_id = df.dropna(subset=['track_id']).drop_duplicates(subset='track_id').set_index('track_id', drop=False)
+    for batch in spse.chunk_ids(pending_ids, batch_size):
+        batch_df = rows_by_id.loc[batch]
+        if {'album_name', 'track_artist'} <= set(batch_df.columns) or 'track_album_id' in batch_df.columns:
+            release_dates = spse.get_release_dates_by_album(sp_client, batch_df, max_workers=max_workers, cache=cache)
+        else:
+            release_dates = spse.get_tracks_release_dates(sp_client, batch, max_workers=max_workers, cache=cache)
+
+        batch_results = pd.DataFrame({'track_id': batch, 'release_date': [release_dates.get(t) for t in batch]})
+        batch_results.to_csv(results_path, mode='a', header=not results_path.exists(), index=False)
+
+        # Throughput of this run
+        elapsed = max(time.time() - start_time, 1e-9)
+        cache_now = spac.cache_stats.get(spac.TRACK_RELEASE_DATE, {'hits': 0, 'misses': 0})
+        hits = cache_now['hits'] - start_cache['hits']
+        lookups = hits + cache_now['misses'] - start_cache['misses']
+        stats['tracks_done'] += int(batch_results['release_date'].notna().sum())
+        stats['tracks_processed'] = stats.get('tracks_processed', 0) + len(batch)
+        stats['api_calls'] = spse.api_stats['calls'] - start_calls
+        stats['elapsed_sec'] = elapsed
+        stats['tracks_per_sec'] = stats['tracks_processed'] / elapsed
+        stats['api_calls_per_sec'] = stats['api_calls'] / elapsed
+        stats['cache_hit_ratio'] = hits / lookups if lookups else 0.0
+        _write_json_atomic({'job_name': job_name, 'updated_at': time.time(), 'stats': stats}, job_dir / "state.json")
+        print(format_job_stats(stats))
+
+    results = load_job_results(job_dir)
+    df = df.copy()
+    df['release_date'] = df['track_id'].map(dict(zip(results['track_id'], results['release_date'])))
+    return df
@@ -0,0 +1,131 @@
+import functools
+import hashlib
+import inspect
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+import spotify_cache
+import spotify_fingerprint as sfp
+
+# Memory budget of the serialized figures
+FIGURE_CACHE_MAX_BYTES = 256 * 1024 ** 2
+# Figures kept by the disk tier (least recently used ones are deleted)
+DISK_CACHE_MAX_FILES = 500
+
+# Serialized (JSON) figures by key, shared by every session of the process
+figure_cache = spotify_cache.MemoryLRUCache(max_bytes=FIGURE_CACHE_MAX_BYTES)
+
+# Optional second tier on disk, see enable_disk_cache
+disk_cache_dir = None
+disk_cache_max_files = DISK_CACHE_MAX_FILES
+
+
+def enable_disk_cache(path, max_files: int = DISK_CACHE_MAX_FILES) -> None:
+    """
+    Also store the figures as JSON files in path, so they survive a restart of the app.
+    """
+    global disk_cache_dir, disk_cache_max_files
+    disk_cache_dir = Path(path)
+    disk_cache_max_files = max_files
+    disk_cache_dir.mkdir(parents=True, exist_ok=True)
+
+
+def _update_digest(digest, value) -> None:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(b'frame:' + sfp.frame_fingerprint(value).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(b'array:' + repr((value.dtype, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, dict):
+        digest.update(b'dict:')
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}:{len(value)}'.encode())
+        for item in value:
+            _update_digest(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def figure_key(function, source_hash: str, args: tuple, kwargs: dict, ignore=()) -> str:
+    """
+    Key of a chart: the function (and its code), the fingerprint of the frames and the other arguments.
+    """
+    bound = inspect.signature(function).bind(*args, **kwargs)
+    bound.apply_defaults()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{function.__module__}.{function.__qualname__}:{source_hash}:{plotly.__version__}'.encode())
+    for name, value in bound.arguments.items():
+        if name in ignore:
+            continue
+        digest.update(name.encode())
+        _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def _read_disk(key: str):
+    if disk_cache_dir is None:
+        return None
+    figure_path = disk_cache_dir / f"{key}.json"
+    try:
+        figure_json = figure_path.read_text()
+    except OSError:
+        return None
+    # Touch the file: the disk tier evicts the least recently used figures
+    os.utime(figure_path)
+    return figure_json
+
+
+def _write_disk(key: str, figure_json: str) -> None:
+    if disk_cache_dir is None:
+        return
+    figure_path = disk_cache_dir / f"{key}.json"
+    tmp_path = figure_path.with_suffix(".tmp")
+    try:
+        tmp_path.write_text(figure_json)
+        os.replace(tmp_path, figure_path)
+        files = sorted(disk_cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old_path in files[:max(len(files) - disk_cache_max_files, 0)]:
+            old_path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Could not write figure to the disk cache: {e}")
+
+
+def cached_figure(function=None, *, ignore=()):
+    """
+    Decorator caching the figures of a plot function by its inputs.
+
+    The figures are stored as JSON in the memory LRU (and on disk when enabled) and a new
+    Figure is returned on every call, so callers can modify it.
+
+    Parameters:
+    function (callable): The plot function (the decorator can also be used as @cached_figure(ignore=...)).
+    ignore (tuple): Arguments that don't change the figure (e.g. lookup indexes).
+    """
+    if function is None:
+        return functools.partial(cached_figure, ignore=ignore)
+
+    # The figure also depends on the helpers of its module: any code change there invalidates it
+    source_hash = hashlib.blake2b(inspect.getsource(inspect.getmodule(function)).encode(), digest_size=8).hexdigest()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = figure_key(function, source_hash, args, kwargs, ignore)
+        figure_json = figure_cache.get(key)
+        if figure_json is None:
+            figure_json = _read_disk(key)
+            if figure_json is None:
+                figure_json = function(*args, **kwargs).to_json()
+                _write_disk(key, figure_json)
+            figure_cache.put(key, figure_json)
+        return pio.from_json(figure_json)
+
+    wrapper.uncached = function
+    return wrapper
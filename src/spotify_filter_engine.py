@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+# Columns filtered by value; their labels are encoded once as integer codes
+CODED_COLUMNS = ['track_genre', 'track_artist', 'track_name']
+
+# Filter steps, in the order the dashboard applies them.
+# A spec is a dict {step: value}; missing/empty values mean "no filter".
+#   popularity_range: (min, max) inclusive
+#   genres / artists / tracks: list of labels to keep
+#   top_n_genres / top_n_artists: keep the N labels with most tracks (among the rows kept so far)
+FILTER_STEPS = ['popularity_range', 'genres', 'top_n_genres', 'artists', 'top_n_artists', 'tracks']
+
+STEP_COLUMNS = {
+    'genres': 'track_genre',
+    'top_n_genres': 'track_genre',
+    'artists': 'track_artist',
+    'top_n_artists': 'track_artist',
+    'tracks': 'track_name',
+}
+
+
+def build_filter_context(df: pd.DataFrame, weights: np.ndarray = None) -> dict:
+    """
+    Precompute what the filters need: the popularity array and sorted category codes.
+
+    Codes are shifted by one so 0 means a missing value, and the labels are sorted,
+    so sorted option lists come straight from the codes.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    weights (np.ndarray): Optional number of tracks behind each row, when the rows are
+    aggregates (e.g. the cells of spotify_cube); the top N steps count tracks, not rows.
+
+    Returns:
+    dict: The filter context for that DataFrame.
+    """
+    context = {'n_rows': len(df)}
+    if weights is not None:
+        context['weights'] = np.asarray(weights, dtype=np.int64)
+    if 'track_popularity' in df.columns:
+        context['track_popularity'] = df['track_popularity'].to_numpy()
+
+    for column in CODED_COLUMNS:
+        if column not in df.columns:
+            continue
+        codes, labels = pd.factorize(df[column], sort=True)
+        context[column] = {
+            'codes': (codes + 1).astype(np.int32),
+            'labels': np.asarray(labels, dtype=object),
+            'positions': {label: i + 1 for i, label in enumerate(labels)},
+        }
+    return context
+
+
+def normalize_filter_spec(spec: dict) -> tuple:
+    """
+    Turn a filter spec into a hashable key: steps in order, no-op values removed, lists sorted.
+    """
+    key = []
+    for step in FILTER_STEPS:
+        value = spec.get(step)
+        if value is None or (isinstance(value, (list, tuple, set)) and len(value) == 0):
+            continue
+        if step == 'popularity_range':
+            value = (int(value[0]), int(value[1]))
+        elif step.startswith('top_n'):
+            value = int(value)
+        else:
+            value = tuple(sorted(value))
+        key.append((step, value))
+    return tuple(key)
+
+
+def full_mask(context: dict) -> np.ndarray:
+    return np.ones(context['n_rows'], dtype=bool)
+
+
+def _label_lookup(column_context: dict, labels) -> np.ndarray:
+    # Boolean table indexed by code: True for the selected labels
+    selected = np.zeros(len(column_context['labels']) + 1, dtype=bool)
+    positions = [column_context['positions'].get(label) for label in labels]
+    selected[[p for p in positions if p is not None]] = True
+    return selected
+
+
+def label_counts(context: dict, mask: np.ndarray, column: str) -> np.ndarray:
+    """
+    Number of kept rows (tracks, when weighted) per label of a coded column (index 0 is the missing values).
+    """
+    column_context = context[column]
+    minlength = len(column_context['labels']) + 1
+    if 'weights' in context:
+        counts = np.bincount(column_context['codes'][mask], weights=context['weights'][mask], minlength=minlength)
+        return counts.astype(np.int64)
+    return np.bincount(column_context['codes'][mask], minlength=minlength)
+
+
+def apply_filter_step(context: dict, mask: np.ndarray, step: str, value) -> np.ndarray:
+    """
+    Apply one filter step on top of the current mask.
+
+    Parameters:
+    context (dict): The filter context.
+    mask (np.ndarray): Boolean mask of the rows kept so far (not modified).
+    step (str): One of FILTER_STEPS.
+    value: The step value, see FILTER_STEPS.
+
+    Returns:
+    np.ndarray: The new boolean mask.
+    """
+    if value is None or (isinstance(value, (list, tuple, set)) and len(value) == 0):
+        return mask
+
+    if step == 'popularity_range':
+        popularity = context['track_popularity']
+        return mask & (popularity >= value[0]) & (popularity <= value[1])
+
+    column_context = context[STEP_COLUMNS[step]]
+    if step.startswith('top_n'):
+        counts = label_counts(context, mask, STEP_COLUMNS[step])
+        counts[0] = 0
+        # Stable sort: ties are broken by label order, so the result is deterministic
+        top_codes = np.argsort(-counts, kind='stable')[:int(value)]
+        selected = np.zeros(len(counts), dtype=bool)
+        selected[top_codes[counts[top_codes] > 0]] = True
+    else:
+        selected = _label_lookup(column_context, value)
+    return mask & selected[column_context['codes']]
+
+
+def compute_filter_mask(context: dict, spec: dict) -> np.ndarray:
+    """
+    Build the combined boolean mask of a whole filter spec, without slicing the DataFrame.
+    """
+    mask = full_mask(context)
+    for step in FILTER_STEPS:
+        mask = apply_filter_step(context, mask, step, spec.get(step))
+    return mask
+
+
+def filter_options(context: dict, mask: np.ndarray, column: str) -> list:
+    """
+    Sorted labels of a coded column that are present in the kept rows.
+    """
+    counts = label_counts(context, mask, column)
+    present = np.flatnonzero(counts[1:])
+    return context[column]['labels'][present].tolist()
+
+
+def count_unique(context: dict, mask: np.ndarray, column: str) -> int:
+    """
+    Number of distinct (non missing) labels of a coded column in the kept rows.
+    """
+    return int(np.count_nonzero(label_counts(context, mask, column)[1:]))
+
+
+def materialize(df: pd.DataFrame, mask: np.ndarray) -> pd.DataFrame:
+    """
+    Slice the DataFrame once with the final mask (no copy when nothing is filtered out).
+    """
+    if mask.all():
+        return df
+    return df.iloc[np.flatnonzero(mask)]
+
+
+def apply_filters(df: pd.DataFrame, spec: dict, context: dict = None) -> pd.DataFrame:
+    """
+    Filter the DataFrame with a declarative spec in a single pass.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    spec (dict): The filter spec, see FILTER_STEPS.
+    context (dict): Precomputed context of df (built on the fly when not given).
+
+    Returns:
+    pd.DataFrame: The filtered DataFrame.
+    """
+    if context is None:
+        context = build_filter_context(df)
+    return materialize(df, compute_filter_mask(context, spec))
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# (path, size, mtime) -> content hash, so an unchanged file is read once per process
+_file_hash_memo = {}
+
+# (id(frame), kind, columns, index) -> hashes of the frames seen so far (dropped with the frame)
+_frame_memo = {}
+_lock = threading.Lock()
+
+
+def file_hash(file_path, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute a content hash of a file, reading it in chunks.
+
+    Parameters:
+    file_path (str | Path): The file to hash.
+    chunk_size (int): Number of bytes read per chunk.
+
+    Returns:
+    str: The hex digest of the file content.
+    """
+    stat = os.stat(file_path)
+    memo_key = (str(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _file_hash_memo:
+        return _file_hash_memo[memo_key]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    _file_hash_memo[memo_key] = digest.hexdigest()
+    return _file_hash_memo[memo_key]
+
+
+def _memoized(frame, memo_key: tuple, compute):
+    # Hashes are computed once per object: the prepared frame and the cached views are
+    # read-only and reused across reruns, later calls are a dictionary lookup
+    memo_key = (id(frame),) + memo_key
+    with _lock:
+        if memo_key in _frame_memo:
+            return _frame_memo[memo_key]
+    value = compute()
+    with _lock:
+        _frame_memo[memo_key] = value
+    weakref.finalize(frame, _frame_memo.pop, memo_key, None)
+    return value
+
+
+def combine_unordered(hashes) -> str:
+    """
+    Order-independent digest of 64-bit hashes (count, wrapping sums and xor), in one O(n) pass.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    summary = np.array([
+        len(hashes),
+        hashes.sum(dtype=np.uint64),
+        (hashes * hashes).sum(dtype=np.uint64),
+        np.bitwise_xor.reduce(hashes) if len(hashes) else 0,
+    ], dtype=np.uint64)
+    return hashlib.blake2b(summary.tobytes(), digest_size=16).hexdigest()
+
+
+def column_hashes(df: pd.DataFrame) -> dict:
+    """
+    Content hash of each column of df (dtype and values, in row order).
+
+    Returns:
+    dict: column -> hex digest; the index is under '__index__'.
+    """
+    def compute():
+        hashes = {}
+        for column in df.columns:
+            digest = hashlib.blake2b(repr(df[column].dtype).encode(), digest_size=16)
+            digest.update(pd.util.hash_pandas_object(df[column], index=False).to_numpy().tobytes())
+            hashes[column] = digest.hexdigest()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(pd.util.hash_pandas_object(df.index.to_series(), index=False).to_numpy().tobytes())
+        hashes['__index__'] = digest.hexdigest()
+        return hashes
+
+    return _memoized(df, ('columns',), compute)
+
+
+def frame_fingerprint(frame) -> str:
+    """
+    Content hash of a DataFrame/Series (index, columns and values, in row order),
+    combined from the per-column hashes.
+    """
+    def compute():
+        as_frame = frame.to_frame(name=frame.name) if isinstance(frame, pd.Series) else frame
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(list(as_frame.columns)).encode())
+        for value in column_hashes(as_frame).values():
+            digest.update(value.encode())
+        return digest.hexdigest()
+
+    return _memoized(frame, ('fingerprint',), compute)
+
+
+def row_hashes(df: pd.DataFrame, columns=None, index: bool = False) -> np.ndarray:
+    """
+    64-bit content hash of each row of df.
+
+    Parameters:
+    df (pd.DataFrame): The frame.
+    columns (list): Columns hashed (None for all); a derived artefact only depends on its columns.
+    index (bool): Also hash the index label of each row.
+
+    Returns:
+    np.ndarray: uint64 hash of each row, in df's order.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    return _memoized(df, ('rows', tuple(columns), index),
+                     lambda: pd.util.hash_pandas_object(df[columns], index=index).to_numpy())
+
+
+def rows_fingerprint(df: pd.DataFrame, mask=None, columns=None, index: bool = False) -> str:
+    """
+    Order-independent content hash of (a subset of) the rows of df.
+
+    The row hashes of df are computed once, so the fingerprint of any mask over the
+    prepared frame (a filtered view, a genre) is a single pass over the selected hashes.
+    Two views with the same rows have the same fingerprint, whatever the filters or
+    the version of the dataset that produced them.
+
+    Parameters:
+    df (pd.DataFrame): The frame the mask applies to.
+    mask (np.ndarray): Boolean mask (or positions) of the selected rows; None selects all.
+    columns (list): Columns hashed, see row_hashes.
+    index (bool): Also hash the index labels (for results indexed like the rows).
+
+    Returns:
+    str: The hex digest.
+    """
+    hashes = row_hashes(df, columns, index)
+    if mask is not None:
+        hashes = hashes[mask]
+    return combine_unordered(hashes)
+
+
+def diff_rows(old: pd.DataFrame, new: pd.DataFrame, key_columns: list, columns=None) -> dict:
+    """
+    Row-level diff of two versions of a dataset, matching rows by key.
+
+    Parameters:
+    old, new (pd.DataFrame): The previous and the current version.
+    key_columns (list): Columns identifying a row (e.g. track_id and track_genre).
+    columns (list): Columns compared (None for all the columns of new).
+
+    Returns:
+    dict: 'added' (labels of new), 'removed' (labels of old), 'changed' (labels of new)
+    and 'changed_previous' (the labels of the changed rows in old), as pd.Index.
+    When a key is repeated, its last row is used.
+    """
+    columns = list(new.columns) if columns is None else list(columns)
+    old_keys = pd.util.hash_pandas_object(old[key_columns], index=False).to_numpy()
+    new_keys = pd.util.hash_pandas_object(new[key_columns], index=False).to_numpy()
+    old_last = ~pd.Series(old_keys).duplicated(keep='last').to_numpy()
+    new_last = ~pd.Series(new_keys).duplicated(keep='last').to_numpy()
+
+    old_positions = pd.Index(old_keys[old_last]).get_indexer(new_keys)
+    matched = new_last & (old_positions >= 0)
+    previous = np.flatnonzero(old_last)[old_positions[matched]]
+    changed = row_hashes(new, columns)[matched] != row_hashes(old, columns)[previous]
+
+    return {
+        'added': new.index[new_last & (old_positions < 0)],
+        'removed': old.index[old_last & ~np.isin(old_keys, new_keys)],
+        'changed': new.index[matched][changed],
+        'changed_previous': old.index[previous[changed]],
+    }
+
+
+def affected_values(old: pd.DataFrame, new: pd.DataFrame, diff: dict, column: str) -> set:
+    """
+    Values of column (e.g. the genres) whose rows differ between old and new, i.e. the
+    segments whose aggregates have to be rebuilt after the change.
+    """
+    values = set(old.loc[diff['removed'].append(diff['changed_previous']), column].unique())
+    values |= set(new.loc[diff['added'].append(diff['changed']), column].unique())
+    return values
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+import spotify_cache
+
+# Features compared by the "Distance to Hit" score
+HIT_FEATURES = ['danceability', 'energy', 'valence', 'acousticness', 'loudness']
+
+# Popularity above which a track is a hit (the fallback is used when there are no hits)
+HIT_THRESHOLD = 75
+FALLBACK_HIT_THRESHOLD = 60
+
+# Hit references and score columns per filter segment
+_scoring_cache = spotify_cache.MemoryLRUCache(max_bytes=128 * 1024 ** 2)
+
+
+def compute_hit_reference(df: pd.DataFrame):
+    """
+    Centroid and range of the hits of df, i.e. what the Distance to Hit score compares to.
+
+    Parameters:
+    df (pd.DataFrame): The (filtered) prepared Spotify DataFrame.
+
+    Returns:
+    dict | None: 'centroid', 'min' and 'max' of the hit features, None when there are no hits.
+    """
+    hits = df[df['track_popularity'] > HIT_THRESHOLD]
+    if hits.empty:
+        hits = df[df['track_popularity'] > FALLBACK_HIT_THRESHOLD]
+    if hits.empty:
+        return None
+
+    X_hits = hits[HIT_FEATURES].to_numpy(dtype='float64')
+    return {
+        'centroid': X_hits.mean(axis=0),
+        'min': X_hits.min(axis=0),
+        'max': X_hits.max(axis=0),
+        'n_hits': len(hits),
+    }
+
+
+def score_tracks(df: pd.DataFrame, reference: dict) -> pd.Series:
+    """
+    Hit similarity score (0-100) of every row of df at once.
+
+    Same score as the gauge: features min-max scaled over the hits plus the scored track,
+    Euclidean distance to the hit centroid, 100 * (1 - distance / sqrt(n_features)).
+    The per-track scaler is vectorized: its range is [min(hits_min, x), max(hits_max, x)].
+
+    Parameters:
+    df (pd.DataFrame): The tracks to score.
+    reference (dict): The hit reference from compute_hit_reference.
+
+    Returns:
+    pd.Series: The 'hit_score' of each row, indexed like df.
+    """
+    X = df[HIT_FEATURES].to_numpy(dtype='float64')
+    lo = np.minimum(reference['min'], X)
+    hi = np.maximum(reference['max'], X)
+    # Same as MinMaxScaler: a zero range is treated as 1
+    feature_range = hi - lo
+    feature_range[feature_range == 0] = 1
+
+    distances = np.linalg.norm((reference['centroid'] - X) / feature_range, axis=1)
+    max_distance = np.sqrt(len(HIT_FEATURES))
+    scores = np.maximum(0, 100 * (1 - distances / max_distance))
+    return pd.Series(scores, index=df.index, name='hit_score')
+
+
+def get_hit_reference(df: pd.DataFrame, segment_key=None):
+    """
+    compute_hit_reference, cached per segment (e.g. the content hash of a dashboard view) when segment_key is given.
+    """
+    if segment_key is None:
+        return compute_hit_reference(df)
+    return _scoring_cache.get_or_set(('reference', segment_key), lambda: compute_hit_reference(df))
+
+
+def get_hit_scores(df: pd.DataFrame, segment_key=None):
+    """
+    Hit score column of df against the hits of df, cached per segment when segment_key is given.
+
+    Returns:
+    pd.Series | None: The 'hit_score' of each row, None when df has no hits.
+    """
+    def build():
+        reference = get_hit_reference(df, segment_key)
+        return None if reference is None else score_tracks(df, reference)
+
+    if segment_key is None:
+        return build()
+    return _scoring_cache.get_or_set(('scores', segment_key), build)
+
+
+def rank_closest_to_hit(df: pd.DataFrame, top_k: int = 20, exclude_hits: bool = True, segment_key=None) -> pd.DataFrame:
+    """
+    Tracks of df ranked by hit similarity score.
+
+    Parameters:
+    df (pd.DataFrame): The (filtered) prepared Spotify DataFrame.
+    top_k (int): Number of tracks returned.
+    exclude_hits (bool): Leave out the tracks that are already hits.
+    segment_key: Optional cache key of df (see get_hit_scores).
+
+    Returns:
+    pd.DataFrame: The top_k tracks with their 'hit_score', best first.
+    """
+    scores = get_hit_scores(df, segment_key)
+    columns = ['track_name', 'track_artist', 'track_genre', 'track_popularity']
+    if scores is None:
+        return pd.DataFrame(columns=columns + ['hit_score'])
+
+    candidates = df.loc[:, columns].assign(hit_score=scores)
+    if exclude_hits:
+        candidates = candidates[df['track_popularity'] <= HIT_THRESHOLD]
+    # The same track is listed once per genre, keep its best row
+    candidates = candidates.assign(track_id=df['track_id']).sort_values('hit_score', ascending=False, kind='stable')
+    ranked = candidates.drop_duplicates(subset='track_id').head(top_k)
+    return ranked.drop(columns='track_id').reset_index(drop=True)
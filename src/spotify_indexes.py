@@ -0,0 +1,147 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+# Columns with a value -> rows index
+INDEXED_COLUMNS = ['track_name', 'track_artist', 'track_genre', 'track_id']
+
+
+def build_column_index(values: pd.Series) -> dict:
+    """
+    Build the inverted index of one column.
+
+    Labels are sorted case-insensitively, so the rows of a label (and of a whole prefix)
+    are one contiguous slice of 'positions', delimited by 'offsets' (CSR layout).
+
+    Parameters:
+    values (pd.Series): The column to index.
+
+    Returns:
+    dict: labels, search keys, label -> code, row codes, positions and offsets.
+    """
+    codes, labels = pd.factorize(values, sort=False)
+    labels = np.asarray(labels, dtype=object)
+    keys = np.array([str(label).casefold() for label in labels], dtype=str)
+
+    # Sort by (casefold, exact label) and renumber the codes in that order
+    order = np.lexsort((labels.astype(str), keys))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    row_codes = np.where(codes >= 0, rank[codes], -1)
+
+    valid_rows = np.flatnonzero(row_codes >= 0)
+    positions = valid_rows[np.argsort(row_codes[valid_rows], kind='stable')]
+    offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(row_codes[valid_rows], minlength=len(labels)))
+
+    sorted_labels = labels[order]
+    return {
+        'labels': sorted_labels,
+        'options': sorted_labels.tolist(),
+        'keys': keys[order].tolist(),
+        'code_of': {label: code for code, label in enumerate(sorted_labels)},
+        'row_codes': row_codes,
+        'positions': positions,
+        'offsets': offsets,
+    }
+
+
+def build_spotify_indexes(df: pd.DataFrame) -> dict:
+    """
+    Build the inverted indexes of the prepared Spotify DataFrame.
+
+    Positions are row positions in df; 'row_labels' maps them back to index labels so the
+    indexes also work on filtered views of df (views keep the original index labels).
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+
+    Returns:
+    dict: The indexes, one entry per indexed column.
+    """
+    indexes = {
+        'n_rows': len(df),
+        'row_labels': df.index.to_numpy(),
+    }
+    for column in INDEXED_COLUMNS:
+        if column in df.columns:
+            indexes[column] = build_column_index(df[column])
+    return indexes
+
+
+def get_options(indexes: dict, column: str) -> list:
+    """
+    Pre-sorted list of all the values of a column.
+    """
+    return indexes[column]['options']
+
+
+def lookup_positions(indexes: dict, column: str, value) -> np.ndarray:
+    """
+    Row positions (in the indexed DataFrame) of the rows where column == value.
+    """
+    column_index = indexes[column]
+    code = column_index['code_of'].get(value)
+    if code is None:
+        return np.empty(0, dtype=np.int64)
+    return column_index['positions'][column_index['offsets'][code]:column_index['offsets'][code + 1]]
+
+
+def _is_indexed_frame(df: pd.DataFrame, indexes: dict) -> bool:
+    # Filtered views are subsets of the indexed frame, so same length means same frame
+    return len(df) == indexes['n_rows']
+
+
+def _present_in_view(df: pd.DataFrame, indexes: dict, positions: np.ndarray) -> np.ndarray:
+    # Locations in df of the given positions of the indexed frame (-1 when filtered out)
+    return df.index.get_indexer(indexes['row_labels'][positions])
+
+
+def lookup_rows(df: pd.DataFrame, indexes: dict, column: str, value) -> pd.DataFrame:
+    """
+    Rows of df where column == value, without scanning df.
+
+    Parameters:
+    df (pd.DataFrame): The indexed DataFrame or a filtered view of it.
+    indexes (dict): The indexes from build_spotify_indexes.
+    column (str): The indexed column.
+    value: The value to look up.
+
+    Returns:
+    pd.DataFrame: The matching rows of df.
+    """
+    positions = lookup_positions(indexes, column, value)
+    if _is_indexed_frame(df, indexes):
+        return df.iloc[positions]
+    locations = _present_in_view(df, indexes, positions)
+    return df.iloc[locations[locations >= 0]]
+
+
+def search_prefix(indexes: dict, column: str, prefix: str, limit: int = None, df: pd.DataFrame = None) -> list:
+    """
+    Values of a column starting with prefix (case-insensitive), in sorted order.
+
+    Parameters:
+    indexes (dict): The indexes from build_spotify_indexes.
+    column (str): The indexed column.
+    prefix (str): The beginning of the value; empty returns every value.
+    limit (int): Maximum number of values returned.
+    df (pd.DataFrame): Optional filtered view; only values with rows in it are returned.
+
+    Returns:
+    list: The matching values.
+    """
+    column_index = indexes[column]
+    key = (prefix or "").casefold()
+    lo = bisect_left(column_index['keys'], key)
+    hi = bisect_right(column_index['keys'], key + chr(0x10FFFF))
+
+    if df is None or _is_indexed_frame(df, indexes):
+        return column_index['options'][lo:hi][:limit]
+
+    # Keep the values that still have a row in the view; the rows of a prefix are contiguous
+    positions = column_index['positions'][column_index['offsets'][lo]:column_index['offsets'][hi]]
+    present = positions[_present_in_view(df, indexes, positions) >= 0]
+    codes = np.unique(column_index['row_codes'][present])[:limit]
+    return column_index['labels'][codes].tolist()
@@ -0,0 +1,271 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.inspection import permutation_importance
+
+import spotify_dataframe_functions as sdf
+import spotify_fingerprint as sfp
+
+# Features of the popularity model (Feature Importance Waterfall)
+IMPORTANCE_FEATURES = ['danceability', 'energy', 'valence', 'loudness', 'acousticness',
+                       'instrumentalness', 'speechiness', 'tempo', 'duration_ms', 'liveness']
+
+# Columns the model depends on: a segment is only retrained when these change
+MODEL_COLUMNS = IMPORTANCE_FEATURES + ['track_popularity']
+
+# Genres with fewer rows use the global model
+MIN_SEGMENT_ROWS = 200
+
+# Rows used by the permutation importance of the gradient boosting model
+PERMUTATION_SAMPLE_ROWS = 5000
+
+models_dir = sdf.cache_dir / "models"
+
+# (fingerprint, segment, model_type) -> importances, so each model is read from disk once per process
+_importances_memo = {}
+# (dataset fingerprint, segment) -> fingerprint of the model columns of the segment rows
+_segment_fingerprints = {}
+_memo_lock = threading.Lock()
+# model path -> lock, so concurrent sessions train (and write) each model once
+_train_locks = {}
+
+
+def train_popularity_model(df: pd.DataFrame, model_type: str = 'random_forest', n_jobs: int = -1,
+                           random_state: int = 42):
+    """
+    Fit the popularity model on all the rows of df.
+
+    Parameters:
+    df (pd.DataFrame): The (segment of the) prepared Spotify DataFrame.
+    model_type (str): 'random_forest' (same settings as the chart used to have, on all cores)
+    or 'hist_gradient_boosting' (faster on millions of rows, permutation importances).
+    n_jobs (int): Number of cores used.
+    random_state (int): Seed of the model.
+
+    Returns:
+    tuple: (fitted model, pd.Series of feature importances)
+    """
+    train_df = df.dropna(subset=IMPORTANCE_FEATURES + ['track_popularity'])
+    X = train_df[IMPORTANCE_FEATURES].astype('float64')
+    y = train_df['track_popularity'].astype('float64')
+
+    if model_type == 'hist_gradient_boosting':
+        model = HistGradientBoostingRegressor(max_depth=5, random_state=random_state)
+        model.fit(X, y)
+        sample = X.sample(min(PERMUTATION_SAMPLE_ROWS, len(X)), random_state=random_state)
+        result = permutation_importance(model, sample, y.loc[sample.index], n_repeats=5,
+                                        random_state=random_state, n_jobs=n_jobs)
+        importances = np.clip(result.importances_mean, 0, None)
+        importances = importances / importances.sum() if importances.sum() > 0 else importances
+    else:
+        model = RandomForestRegressor(n_estimators=50, max_depth=5, random_state=random_state, n_jobs=n_jobs)
+        model.fit(X, y)
+        importances = model.feature_importances_
+
+    return model, pd.Series(importances, index=IMPORTANCE_FEATURES)
+
+
+def get_model_path(fingerprint: str, segment: str, model_type: str):
+    # Segment names (genres) may contain any character, hash them for the file name
+    segment_id = hashlib.blake2b(segment.encode(), digest_size=8).hexdigest()
+    return models_dir / f"{fingerprint}_{model_type}_{segment_id}.joblib"
+
+
+def load_or_train(get_segment_df, fingerprint: str, segment: str = 'all',
+                  model_type: str = 'random_forest') -> pd.Series:
+    """
+    Feature importances of the model of a segment, trained once and stored on disk.
+
+    Parameters:
+    get_segment_df (callable): Returns the rows of the segment; only called when training.
+    fingerprint (str): Fingerprint of the segment rows (see get_segment_importances).
+    segment (str): 'all' or 'genre:<name>'.
+    model_type (str): See train_popularity_model.
+
+    Returns:
+    pd.Series: The feature importances.
+    """
+    memo_key = (fingerprint, segment, model_type)
+    model_path = get_model_path(fingerprint, segment, model_type)
+    with _memo_lock:
+        if memo_key in _importances_memo:
+            return _importances_memo[memo_key]
+        train_lock = _train_locks.setdefault(model_path, threading.Lock())
+
+    with train_lock:
+        # Another thread may have trained the model while this one was waiting
+        with _memo_lock:
+            if memo_key in _importances_memo:
+                return _importances_memo[memo_key]
+
+        entry = None
+        if model_path.exists():
+            try:
+                entry = joblib.load(model_path)
+            except Exception:
+                entry = None
+
+        if entry is None:
+            segment_df = get_segment_df()
+            model, importances = train_popularity_model(segment_df, model_type=model_type)
+            entry = {'model': model, 'importances': importances, 'segment': segment,
+                     'fingerprint': fingerprint, 'n_rows': len(segment_df)}
+            models_dir.mkdir(parents=True, exist_ok=True)
+            # A file of its own per writer: the precompute workers may write the same model
+            tmp_fd, tmp_name = tempfile.mkstemp(dir=models_dir, prefix=model_path.name, suffix=".tmp")
+            try:
+                with os.fdopen(tmp_fd, 'wb') as f:
+                    joblib.dump(entry, f)
+                os.replace(tmp_name, model_path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+            # Models of previous versions of this segment are stale
+            for old_path in models_dir.glob(f"*{model_path.name[len(fingerprint):]}"):
+                if old_path != model_path:
+                    old_path.unlink(missing_ok=True)
+
+        with _memo_lock:
+            _importances_memo[memo_key] = entry['importances']
+        return entry['importances']
+
+
+def has_model(fingerprint: str, segment: str = 'all', model_type: str = 'random_forest') -> bool:
+    """
+    Whether the model of a segment is already loaded or stored (no training needed).
+    """
+    with _memo_lock:
+        if (fingerprint, segment, model_type) in _importances_memo:
+            return True
+    return get_model_path(fingerprint, segment, model_type).exists()
+
+
+def _segment_mask(base_df: pd.DataFrame, segment: str):
+    if segment == 'all':
+        return None
+    return (base_df['track_genre'] == segment.split(':', 1)[1]).to_numpy()
+
+
+def get_segment_fingerprint(base_df: pd.DataFrame, fingerprint: str, segment: str) -> str:
+    """
+    Fingerprint of the rows of a segment (MODEL_COLUMNS only), which keys its model.
+
+    Parameters:
+    base_df (pd.DataFrame): The unfiltered prepared DataFrame.
+    fingerprint (str): Fingerprint of base_df.
+    segment (str): 'all' or 'genre:<name>'.
+
+    Returns:
+    str: The segment fingerprint.
+    """
+    memo_key = (fingerprint, segment)
+    with _memo_lock:
+        segment_fingerprint = _segment_fingerprints.get(memo_key)
+    if segment_fingerprint is None:
+        segment_fingerprint = sfp.rows_fingerprint(base_df, _segment_mask(base_df, segment), MODEL_COLUMNS)
+        with _memo_lock:
+            _segment_fingerprints[memo_key] = segment_fingerprint
+    return segment_fingerprint
+
+
+def get_segment_importances(base_df: pd.DataFrame, fingerprint: str, segment: str,
+                            model_type: str = 'random_forest') -> pd.Series:
+    """
+    Feature importances of the model of one segment of the prepared data.
+
+    Models are keyed by the content of the segment's rows (MODEL_COLUMNS only), not by the
+    dataset fingerprint: when tracks are added to some genres, only those genres (and
+    the global model) are retrained.
+
+    Parameters:
+    base_df (pd.DataFrame): The unfiltered prepared DataFrame.
+    fingerprint (str): Fingerprint of base_df.
+    segment (str): 'all' or 'genre:<name>'.
+    model_type (str): See train_popularity_model.
+
+    Returns:
+    pd.Series: The feature importances.
+    """
+    def get_segment_df():
+        mask = _segment_mask(base_df, segment)
+        return base_df if mask is None else base_df[mask]
+
+    return load_or_train(get_segment_df, get_segment_fingerprint(base_df, fingerprint, segment),
+                         segment, model_type)
+
+
+def get_missing_segments(base_df: pd.DataFrame, fingerprint: str, segments,
+                         model_type: str = 'random_forest') -> list:
+    """
+    The segments whose model still has to be trained.
+
+    Parameters:
+    base_df (pd.DataFrame): The unfiltered prepared DataFrame.
+    fingerprint (str): Fingerprint of base_df.
+    segments (iterable): Segments, e.g. the keys of get_importance_segments.
+    model_type (str): See train_popularity_model.
+
+    Returns:
+    list: The segments without a loaded or stored model.
+    """
+    return [segment for segment in segments
+            if not has_model(get_segment_fingerprint(base_df, fingerprint, segment), segment, model_type)]
+
+
+def get_importance_segments(df: pd.DataFrame, base_df: pd.DataFrame) -> dict:
+    """
+    Models used for the feature importances of a view, with their weight.
+
+    Parameters:
+    df (pd.DataFrame): The filtered view.
+    base_df (pd.DataFrame): The unfiltered prepared DataFrame the models are trained on.
+
+    Returns:
+    dict: segment ('all' or 'genre:<name>') -> number of rows of the view it covers.
+    """
+    if len(df) == len(base_df) or 'track_genre' not in df.columns:
+        return {'all': len(df)}
+
+    genre_counts = df['track_genre'].value_counts()
+    genre_counts = genre_counts[genre_counts > 0]
+    if genre_counts.empty:
+        return {'all': len(df)}
+
+    base_counts = base_df['track_genre'].value_counts()
+    segments = {}
+    for genre, count in genre_counts.items():
+        # Genres too small for their own model use the global one
+        segment = f"genre:{genre}" if base_counts.get(genre, 0) >= MIN_SEGMENT_ROWS else 'all'
+        segments[segment] = segments.get(segment, 0) + int(count)
+    return segments
+
+
+def get_feature_importances(df: pd.DataFrame, base_df: pd.DataFrame, fingerprint: str,
+                            model_type: str = 'random_forest') -> pd.Series:
+    """
+    Feature importances for any filtered view of the dataset, from cached per-segment models.
+
+    The unfiltered data uses the global model. A filtered view combines the per-genre
+    models weighted by the number of rows of each genre in the view (genres too small for
+    their own model use the global one).
+
+    Parameters:
+    df (pd.DataFrame): The filtered view.
+    base_df (pd.DataFrame): The unfiltered prepared DataFrame the models are trained on.
+    fingerprint (str): Fingerprint of base_df.
+    model_type (str): See train_popularity_model.
+
+    Returns:
+    pd.Series: The feature importances.
+    """
+    segments = get_importance_segments(df, base_df)
+    weighted = pd.Series(0.0, index=IMPORTANCE_FEATURES)
+    for segment, count in segments.items():
+        weighted += get_segment_importances(base_df, fingerprint, segment, model_type) * count
+    return weighted / sum(segments.values())
@@ -0,0 +1,198 @@
+import os
+import threading
+
+import pandas as pd
+# joblib's process pool (installed with scikit-learn): unlike multiprocessing's spawn, its
+# workers don't re-run the __main__ module, which under Streamlit is the dashboard script
+from joblib.externals.loky import ProcessPoolExecutor
+
+import spotify_dataframe_functions as sdf
+import spotify_embeddings as semb
+import spotify_filter_engine as sfe
+import spotify_fingerprint as sfp
+import spotify_model_registry as smr
+import spotify_trendlines as strend
+
+# Genres (by track count) whose views are warmed after the default view
+PRECOMPUTE_TOP_GENRES = 5
+
+# Worker processes; the dashboard keeps the other cores
+PRECOMPUTE_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+
+# Let the workers fit the t-SNE projection of the full catalog when none is stored. Off by
+# default: the fit takes minutes on all the cores and runs offline (python src/spotify_embeddings.py);
+# the workers only extend a stored projection to the tracks added since.
+FIT_EMBEDDING = False
+
+# (x, y) of the LOWESS trendlines of the dashboard
+TRENDLINE_COLUMNS = [('loudness', 'track_popularity'), ('liveness', 'track_popularity')]
+
+# Prepared DataFrame of a worker process, loaded once by _init_worker
+_worker_df = None
+
+# Managers whose workers are running, see shutdown_managers
+_managers = []
+_managers_lock = threading.Lock()
+
+
+def _init_worker(csv_path, cache_dir, deltas_dir, models_dir) -> None:
+    # Workers are new processes: point them to the same files as the dashboard and load the
+    # prepared data once (from the snapshot the dashboard already saved)
+    global _worker_df
+    sdf.csv_path = csv_path
+    sdf.cache_dir = cache_dir
+    sdf.deltas_dir = deltas_dir
+    smr.models_dir = models_dir
+    _worker_df = sdf.prepare_spotify_data()
+
+
+def _importances_task(fingerprint: str, segment: str) -> pd.Series:
+    return smr.get_segment_importances(_worker_df, fingerprint, segment)
+
+
+def _embedding_task(fingerprint: str, build: bool) -> bool:
+    # The embedding is stored on disk, only report that it's there
+    return semb.get_tsne_embedding(_worker_df, fingerprint, build=build) is not None
+
+
+def _trendlines_task(spec: dict) -> tuple:
+    # The dashboard looks the trendlines up by the content of the view (spotify_fingerprint)
+    view = sfe.apply_filters(_worker_df, spec)
+    curves = {(x, y): strend.binned_lowess(view[x].to_numpy(), view[y].to_numpy()) for x, y in TRENDLINE_COLUMNS}
+    return sfp.rows_fingerprint(view, index=True), curves
+
+
+def importances_task_name(segment: str) -> str:
+    return f"importances:{segment}"
+
+
+class PrecomputeManager:
+    """
+    Runs the expensive chart inputs of the dashboard in a background process pool.
+
+    After the data is loaded, start() queues (in this order) the global popularity model,
+    the trendlines of the default view, the per-genre models and trendlines of the top
+    genres and the t-SNE embedding (extended from a stored one, fitted only with
+    FIT_EMBEDDING). Models and embeddings are stored on disk by the worker
+    (spotify_model_registry / spotify_embeddings), the trendlines are put in the
+    trendline cache of this process. The charts check pending() to either wait() for a
+    result or show a placeholder; queue_importances() sends the models of the other views
+    to the workers.
+
+    Parameters:
+    fingerprint (str): The dataset fingerprint.
+    max_workers (int): Number of worker processes.
+    """
+
+    def __init__(self, fingerprint: str, max_workers: int = PRECOMPUTE_WORKERS):
+        self.fingerprint = fingerprint
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(sdf.csv_path, sdf.cache_dir, sdf.deltas_dir, smr.models_dir),
+        )
+        with _managers_lock:
+            _managers.append(self)
+
+    def _submit(self, name: str, function, *args, on_done=None) -> None:
+        with self._lock:
+            # A manager shut down (previous version of the data) takes no new task
+            if self._closed or name in self._futures:
+                return
+            future = self._executor.submit(function, *args)
+            self._futures[name] = future
+        if on_done is not None:
+            def callback(f):
+                if not f.cancelled() and f.exception() is None:
+                    on_done(f.result())
+            future.add_done_callback(callback)
+
+    def _submit_trendlines(self, spec: dict) -> None:
+        def store(result):
+            view_key, curves = result
+            for (x, y), curve in curves.items():
+                strend.put_trendline(x, y, view_key, curve)
+
+        self._submit(f"trendlines:{sfe.normalize_filter_spec(spec)}", _trendlines_task, spec, on_done=store)
+
+    def queue_importances(self, segments) -> list:
+        """
+        Queue the training of the models of segments (not queued yet) and return their task names.
+        """
+        names = []
+        for segment in segments:
+            name = importances_task_name(segment)
+            self._submit(name, _importances_task, self.fingerprint, segment)
+            names.append(name)
+        return names
+
+    def start(self, df: pd.DataFrame, top_genres: int = PRECOMPUTE_TOP_GENRES) -> None:
+        """
+        Queue the precomputation of the default view and of the top genres of df.
+        """
+        self.queue_importances(['all'])
+        self._submit_trendlines({})
+
+        genre_counts = df['track_genre'].value_counts()
+        for genre in genre_counts.index[:top_genres]:
+            if genre_counts[genre] >= smr.MIN_SEGMENT_ROWS:
+                self.queue_importances([f"genre:{genre}"])
+            self._submit_trendlines({'genres': [genre]})
+
+        self._submit('embedding', _embedding_task, self.fingerprint, FIT_EMBEDDING)
+
+    def status(self, name: str):
+        """
+        'pending', 'done' or 'failed' for a queued task, None if it was never queued.
+        """
+        with self._lock:
+            future = self._futures.get(name)
+        if future is None:
+            return None
+        if not future.done():
+            return 'pending'
+        return 'failed' if future.cancelled() or future.exception() is not None else 'done'
+
+    def pending(self, names) -> list:
+        """
+        The tasks among names that are queued or running.
+        """
+        return [name for name in names if self.status(name) == 'pending']
+
+    def wait(self, name: str, timeout: float = None):
+        """
+        Block until a task is finished and return its result (None if unknown or failed).
+        """
+        with self._lock:
+            future = self._futures.get(name)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            print(f"Precompute task {name} failed: {e}")
+            return None
+
+    def shutdown(self) -> None:
+        """
+        Cancel the queued tasks and stop the worker processes (and their copy of the data).
+        """
+        with self._lock:
+            self._closed = True
+        with _managers_lock:
+            if self in _managers:
+                _managers.remove(self)
+        self._executor.shutdown(wait=False, kill_workers=True)
+
+
+def shutdown_managers() -> None:
+    """
+    Shut down every running PrecomputeManager, e.g. before starting the one of a new version of the data.
+    """
+    with _managers_lock:
+        managers = list(_managers)
+    for manager in managers:
+        manager.shutdown()
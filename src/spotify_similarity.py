@@ -0,0 +1,167 @@
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+import spotify_dataframe_functions as sdf
+import spotify_embeddings as semb
+
+# Same feature vector as the t-SNE map and the Distance to Hit gauge
+SIMILARITY_FEATURES = semb.TSNE_FEATURES
+
+# Leaf size of the KD-tree (smaller = faster queries, bigger tree)
+KDTREE_LEAF_SIZE = 40
+
+# Tracks queried together by the batch k-NN
+KNN_BATCH_SIZE = 50_000
+
+
+def get_similarity_index_path(fingerprint: str):
+    return sdf.cache_dir / f"similarity_{fingerprint}.joblib"
+
+
+def build_similarity_index(df: pd.DataFrame) -> dict:
+    """
+    KD-tree over the standardized audio features, one point per track.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+
+    Returns:
+    dict: 'tree' (KDTree), 'track_ids' (track_id of each point), 'position' (track_id -> point),
+    'mean' and 'scale' (the scaler of the features).
+    """
+    # The same track_id is listed once per genre with the same audio features
+    tracks = df.drop_duplicates(subset='track_id').set_index('track_id')
+    features = tracks[SIMILARITY_FEATURES].astype('float64').fillna(0)
+    mean = features.mean()
+    scale = features.std(ddof=0).replace(0, 1)
+    X_scaled = ((features - mean) / scale).to_numpy()
+
+    track_ids = features.index.to_numpy()
+    return {
+        'tree': KDTree(X_scaled, leaf_size=KDTREE_LEAF_SIZE),
+        'track_ids': track_ids,
+        'position': {track_id: i for i, track_id in enumerate(track_ids)},
+        'mean': mean.to_numpy(),
+        'scale': scale.to_numpy(),
+    }
+
+
+def get_similarity_index(df: pd.DataFrame, fingerprint: str) -> dict:
+    """
+    The similarity index of the dataset identified by fingerprint, built once and stored on disk.
+
+    Parameters:
+    df (pd.DataFrame): The prepared Spotify DataFrame.
+    fingerprint (str): The dataset fingerprint.
+
+    Returns:
+    dict: See build_similarity_index.
+    """
+    index_path = get_similarity_index_path(fingerprint)
+    if index_path.exists():
+        try:
+            return joblib.load(index_path)
+        except Exception:
+            pass
+
+    index = build_similarity_index(df)
+    sdf.cache_dir.mkdir(parents=True, exist_ok=True)
+    # A file of its own per writer: the dashboard sessions and the precompute workers may
+    # write the same index at once
+    tmp_fd, tmp_name = tempfile.mkstemp(dir=sdf.cache_dir, prefix=index_path.name, suffix=".tmp")
+    try:
+        with os.fdopen(tmp_fd, 'wb') as f:
+            joblib.dump(index, f)
+        os.replace(tmp_name, index_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    # Indexes of previous versions of the data are stale
+    for old_path in sdf.cache_dir.glob("similarity_*.joblib"):
+        if old_path != index_path:
+            old_path.unlink(missing_ok=True)
+    return index
+
+
+def find_similar_tracks(index: dict, track_id: str, k: int = 10) -> pd.DataFrame:
+    """
+    The k tracks that sound the most like track_id.
+
+    Parameters:
+    index (dict): The similarity index.
+    track_id (str): The reference track.
+    k (int): Number of similar tracks returned.
+
+    Returns:
+    pd.DataFrame: 'track_id' and 'distance' (in standardized feature space), closest first.
+    Empty when the track is not in the index.
+    """
+    position = index['position'].get(track_id)
+    if position is None:
+        return pd.DataFrame(columns=['track_id', 'distance'])
+
+    # The query point is stored in the tree: ask for one more and drop it
+    point = index['tree'].data[position:position + 1]
+    distances, neighbors = index['tree'].query(point, k=min(k + 1, len(index['track_ids'])))
+    keep = neighbors[0] != position
+    similar = pd.DataFrame({
+        'track_id': index['track_ids'][neighbors[0][keep]],
+        'distance': distances[0][keep],
+    })
+    return similar.head(k)
+
+
+def find_similar_to_features(index: dict, features: pd.DataFrame, k: int = 10):
+    """
+    Nearest tracks of arbitrary feature vectors (e.g. tracks that are not in the catalog yet).
+
+    Parameters:
+    index (dict): The similarity index.
+    features (pd.DataFrame): Rows with the SIMILARITY_FEATURES columns.
+    k (int): Number of neighbours per row.
+
+    Returns:
+    tuple: (distances, track_ids) arrays of shape (len(features), k).
+    """
+    X = features[SIMILARITY_FEATURES].astype('float64').fillna(0).to_numpy()
+    X_scaled = (X - index['mean']) / index['scale']
+    distances, neighbors = index['tree'].query(X_scaled, k=min(k, len(index['track_ids'])))
+    return distances, index['track_ids'][neighbors]
+
+
+def batch_knn(index: dict, k: int = 10, batch_size: int = KNN_BATCH_SIZE):
+    """
+    The k nearest neighbours of every track of the index (itself excluded), in batches.
+
+    Parameters:
+    index (dict): The similarity index.
+    k (int): Number of neighbours per track.
+    batch_size (int): Number of tracks queried at once (bounds the memory used).
+
+    Returns:
+    tuple: (distances, neighbors) arrays of shape (n_tracks, k); neighbors are positions
+    in index['track_ids'].
+    """
+    tree = index['tree']
+    data = np.asarray(tree.data)
+    n_tracks = len(data)
+    k = min(k, n_tracks - 1)
+    distances = np.empty((n_tracks, k), dtype='float64')
+    neighbors = np.empty((n_tracks, k), dtype='int64')
+
+    for start in range(0, n_tracks, batch_size):
+        stop = min(start + batch_size, n_tracks)
+        batch_distances, batch_neighbors = tree.query(data[start:stop], k=k + 1)
+        # Drop each track from its own neighbours (it's usually, but not always with exact
+        # duplicates, the first one)
+        is_self = batch_neighbors == np.arange(start, stop)[:, None]
+        is_self[~is_self.any(axis=1), -1] = True
+        keep = ~is_self
+        distances[start:stop] = batch_distances[keep].reshape(-1, k)
+        neighbors[start:stop] = batch_neighbors[keep].reshape(-1, k)
+    return distances, neighbors
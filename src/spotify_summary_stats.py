@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+import spotify_binning as sbin
+
+# Outliers drawn per box (the most extreme ones are always kept)
+MAX_OUTLIERS_PER_GROUP = 50
+
+# Points of each violin curve
+VIOLIN_POINTS = 100
+
+
+def _quantile(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    # Linear interpolation between the closest ranks (numpy/pandas default), for every group at once
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    fraction = position - lower
+    return sorted_values[lower] + fraction * (sorted_values[upper] - sorted_values[lower])
+
+
+def _evenly_spaced(values: np.ndarray, n: int) -> np.ndarray:
+    if len(values) <= n:
+        return values
+    return values[np.linspace(0, len(values) - 1, n).round().astype(np.int64)]
+
+
+def box_stats(df: pd.DataFrame, value: str, group_columns: list, max_outliers: int = MAX_OUTLIERS_PER_GROUP) -> pd.DataFrame:
+    """
+    Box plot statistics of a column per group, computed with one sort of the whole column.
+
+    Whiskers follow the Tukey/Plotly convention: the most extreme values within 1.5 IQR
+    of the quartiles; the values beyond them are outliers.
+
+    Parameters:
+    df (pd.DataFrame): The (filtered) Spotify DataFrame.
+    value (str): The summarized column.
+    group_columns (list): The grouping columns.
+    max_outliers (int): Outliers kept per group, evenly spaced in value (so both extremes are kept).
+
+    Returns:
+    pd.DataFrame: One row per non-empty group: the group columns, 'count', 'mean', 'q1',
+    'median', 'q3', 'lowerfence', 'upperfence' and 'outliers' (np.ndarray of values).
+    """
+    data = df[group_columns + [value]].dropna()
+    if data.empty:
+        return pd.DataFrame(columns=group_columns + ['count', 'mean', 'q1', 'median', 'q3',
+                                                     'lowerfence', 'upperfence', 'outliers'])
+
+    group_codes, groups = pd.MultiIndex.from_frame(data[group_columns]).factorize(sort=True)
+    values = data[value].to_numpy(dtype='float64')
+    order = np.lexsort((values, group_codes))
+    sorted_values = values[order]
+    sorted_codes = group_codes[order]
+
+    counts = np.bincount(sorted_codes, minlength=len(groups))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    q1 = _quantile(sorted_values, starts, counts, 0.25)
+    median = _quantile(sorted_values, starts, counts, 0.5)
+    q3 = _quantile(sorted_values, starts, counts, 0.75)
+    iqr = q3 - q1
+
+    # Whiskers: min/max of the values inside the 1.5 IQR limits of their group
+    low_limit = (q1 - 1.5 * iqr)[sorted_codes]
+    high_limit = (q3 + 1.5 * iqr)[sorted_codes]
+    inside = (sorted_values >= low_limit) & (sorted_values <= high_limit)
+    lowerfence = np.minimum.reduceat(np.where(inside, sorted_values, np.inf), starts)
+    upperfence = np.maximum.reduceat(np.where(inside, sorted_values, -np.inf), starts)
+
+    outlier_codes = sorted_codes[~inside]
+    outlier_values = sorted_values[~inside]
+    outlier_bounds = np.searchsorted(outlier_codes, np.arange(len(groups) + 1))
+    outliers = [
+        _evenly_spaced(outlier_values[outlier_bounds[i]:outlier_bounds[i + 1]], max_outliers)
+        for i in range(len(groups))
+    ]
+
+    stats = groups.set_names(group_columns).to_frame(index=False)
+    stats['count'] = counts
+    stats['mean'] = np.bincount(sorted_codes, weights=sorted_values, minlength=len(groups)) / counts
+    stats['q1'] = q1
+    stats['median'] = median
+    stats['q3'] = q3
+    stats['lowerfence'] = lowerfence
+    stats['upperfence'] = upperfence
+    stats['outliers'] = outliers
+    return stats
+
+
+def violin_curves(df: pd.DataFrame, value: str, group_column: str, n_points: int = VIOLIN_POINTS,
+                  bw_method='silverman') -> dict:
+    """
+    KDE curve of a column per group, for violin/ridgeline charts.
+
+    Each curve spans the group's min to max (like Plotly's 'hard' span mode) and uses the
+    binned FFT KDE of spotify_binning.
+
+    Parameters:
+    df (pd.DataFrame): The (filtered) Spotify DataFrame.
+    value (str): The column whose distribution is drawn.
+    group_column (str): One curve per value of this column.
+    n_points (int): Points per curve.
+    bw_method (str | float): Bandwidth rule, see spotify_binning.binned_kde.
+
+    Returns:
+    dict: group -> (x, density) arrays; groups with less than 2 distinct values are left out.
+    """
+    data = df[[group_column, value]].dropna()
+    curves = {}
+    for group, values in data.groupby(group_column, observed=True, sort=True)[value]:
+        values = values.to_numpy(dtype='float64')
+        if len(values) < 2 or values.min() == values.max():
+            continue
+        x = np.linspace(values.min(), values.max(), n_points)
+        curves[group] = (x, sbin.binned_kde(values, x, bw_method=bw_method))
+    return curves
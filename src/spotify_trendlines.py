@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+import spotify_cache
+
+# Fraction of the data used by each local regression (statsmodels/plotly default)
+LOWESS_FRAC = 2 / 3
+
+# Robustifying iterations (statsmodels default)
+LOWESS_ITERATIONS = 3
+
+# Bins of x the points are summarized into before smoothing
+LOWESS_BINS = 200
+
+# Trendlines per (x, y, filter segment)
+_trendline_cache = spotify_cache.MemoryLRUCache(max_bytes=32 * 1024 ** 2)
+
+
+def binned_lowess(x, y, frac: float = LOWESS_FRAC, iterations: int = LOWESS_ITERATIONS,
+                  n_bins: int = LOWESS_BINS) -> pd.DataFrame:
+    """
+    LOWESS trendline of y against x over all the points, binned for speed.
+
+    The points are summarized per regular x bin (count, sums of x, y, x*x, x*y), then a
+    tricube-weighted local linear regression is fitted at each non-empty bin, with the
+    neighbourhood holding a fraction frac of the points, as in statsmodels' lowess. The
+    tricube weight of a bin applies to all of its points, so the cost is O(n + n_bins^2)
+    per iteration instead of O(n^2). The robustifying iterations reweight each point with
+    the bisquare of its residual, like statsmodels.
+
+    Parameters:
+    x, y (array-like): The points (rows with NaN are ignored).
+    frac (float): Fraction of the points in each local regression.
+    iterations (int): Number of robustifying iterations.
+    n_bins (int): Number of x bins.
+
+    Returns:
+    pd.DataFrame: 'x' (mean x of each non-empty bin) and 'y' (the smoothed value), sorted by x.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    if len(x) == 0:
+        return pd.DataFrame({'x': [], 'y': []})
+    if x.min() == x.max():
+        return pd.DataFrame({'x': [x[0]], 'y': [y.mean()]})
+
+    index = np.minimum(((x - x.min()) / (x.max() - x.min()) * n_bins).astype(np.int64), n_bins - 1)
+    counts = np.bincount(index, minlength=n_bins)
+    present = counts > 0
+    index = (np.cumsum(present) - 1)[index]
+    counts = counts[present].astype('float64')
+    centers = np.bincount(index, weights=x) / counts
+
+    # Tricube weights between bins: each bin's neighbourhood holds frac of the points
+    distances = np.abs(centers[:, None] - centers[None, :])
+    order = np.argsort(distances, axis=1, kind='stable')
+    cumulative = np.cumsum(counts[order], axis=1)
+    reach = np.argmax(cumulative >= min(np.ceil(frac * len(x)), len(x)), axis=1)
+    bandwidth = np.take_along_axis(distances, order, axis=1)[np.arange(len(centers)), reach]
+    bandwidth = np.where(bandwidth > 0, bandwidth, 1.0)
+    # The farthest neighbour still gets a (tiny) weight, like statsmodels' 0.999 * h cutoff
+    kernel = np.clip(1 - (distances / (bandwidth[:, None] / 0.999)) ** 3, 0, None) ** 3
+
+    robustness = np.ones_like(x)
+    for iteration in range(iterations + 1):
+        s0, s1, t0, s2, t1 = (
+            kernel @ np.bincount(index, weights=robustness * values, minlength=len(centers))
+            for values in (np.ones_like(x), x, y, x * x, x * y)
+        )
+        denominator = s0 * s2 - s1 ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = np.where(np.abs(denominator) > 1e-12 * s0 ** 2, (s0 * t1 - s1 * t0) / denominator, 0.0)
+            fitted = np.where(s0 > 0, (t0 - slope * s1) / s0 + slope * centers, np.nan)
+        if iteration == iterations:
+            break
+        residuals = y - np.interp(x, centers, fitted)
+        scale = np.median(np.abs(residuals))
+        if scale == 0:
+            break
+        robustness = np.clip(1 - (residuals / (6 * scale)) ** 2, 0, None) ** 2
+
+    return pd.DataFrame({'x': centers, 'y': fitted})
+
+
+def get_trendline(df: pd.DataFrame, x: str, y: str, segment_key=None, frac: float = LOWESS_FRAC) -> pd.DataFrame:
+    """
+    binned_lowess of two columns of df, cached per (columns, segment) when segment_key is given
+    (e.g. the content hash of a dashboard view).
+    """
+    def build():
+        return binned_lowess(df[x].to_numpy(), df[y].to_numpy(), frac=frac)
+
+    if segment_key is None:
+        return build()
+    return _trendline_cache.get_or_set(('lowess', x, y, frac, segment_key), build)
+
+
+def put_trendline(x: str, y: str, segment_key, trendline: pd.DataFrame, frac: float = LOWESS_FRAC) -> None:
+    """
+    Store a trendline computed elsewhere (e.g. by spotify_precompute) under the key get_trendline uses.
+    """
+    _trendline_cache.put(('lowess', x, y, frac, segment_key), trendline)
@@ -3,18 +3,329 @@
 import json
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import pandas as pd
 import spotipy
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyClientCredentials
 
+import spotify_api_cache as spac
+
+# Maximum number of ids accepted by the /tracks and /albums endpoints
+TRACKS_BATCH_SIZE = 50
+ALBUMS_BATCH_SIZE = 20
+
+# Retries on 429 (rate limited) responses, on top of spotipy's own retries
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Requests sent to the API by this process (read by the enrichment job runner)
+api_stats = {'calls': 0, 'rate_limited': 0}
+_api_stats_lock = threading.Lock()
+
+def normalize_release_date(release_date, precision=None):
+    """
+    Force a release date to the year-month-day format.
+
+    Parameters:
+    release_date (str): 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD'.
+    precision (str): Optional 'release_date_precision' from the API ('year', 'month' or 'day').
+
+    Returns:
+    str | None: The date as 'YYYY-MM-DD' (missing parts set to 01), None when empty.
+    """
+    if not release_date:
+        return None
+    # If the release date is only the year, force the format to year-01-01
+    if precision == 'year' or len(release_date) == 4:
+        return f"{release_date[:4]}-01-01"
+    # Same for year-month precision
+    if precision == 'month' or len(release_date) == 7:
+        return f"{release_date[:7]}-01"
+    return release_date
+
+def call_with_backoff(func, *args, max_retries: int = MAX_RATE_LIMIT_RETRIES, base_delay: float = 1.0, **kwargs):
+    """
+    Call a spotipy method, sleeping and retrying when the API answers 429 (rate limited).
+
+    The Retry-After header is used when present, otherwise the delay doubles on each retry.
+    Other errors (and the last 429) are raised.
+    """
+    for attempt in range(max_retries + 1):
+        with _api_stats_lock:
+            api_stats['calls'] += 1
+        try:
+            return func(*args, **kwargs)
+        except SpotifyException as e:
+            if e.http_status != 429 or attempt == max_retries:
+                raise
+            with _api_stats_lock:
+                api_stats['rate_limited'] += 1
+            retry_after = (e.headers or {}).get('Retry-After')
+            time.sleep(float(retry_after) if retry_after else base_delay * 2 ** attempt)
+
+def chunk_ids(ids, size: int):
+    ids = list(ids)
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+def run_batches(fetch_batch, batches, max_workers: int = 4):
+    """
+    Run fetch_batch over the batches on a thread pool.
+
+    Yields:
+    tuple: (batch, result), result is None when the batch failed.
+    """
+    def fetch(batch):
+        try:
+            return batch, fetch_batch(batch)
+        except Exception as e:
+            print(f"Failed to fetch a batch of {len(batch)} ids: {e}")
+            return batch, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(fetch, batches)
+
+def fetch_tracks_albums(sp_client, track_ids) -> dict:
+    """
+    Album id and release date of up to TRACKS_BATCH_SIZE tracks with a single /tracks call.
+
+    Returns:
+    dict: track_id -> {'album_id', 'release_date'}, None for unknown tracks.
+    """
+    response = call_with_backoff(sp_client.tracks, track_ids)
+    albums = dict.fromkeys(track_ids)
+    for track_id, track in zip(track_ids, response['tracks']):
+        if track is not None:
+            album = track['album']
+            albums[track_id] = {
+                'album_id': album.get('id'),
+                'release_date': normalize_release_date(album['release_date'], album.get('release_date_precision')),
+            }
+    return albums
+
+def fetch_tracks_release_dates(sp_client, track_ids) -> dict:
+    """
+    Release dates of up to TRACKS_BATCH_SIZE tracks with a single /tracks call.
+
+    Returns:
+    dict: track_id -> release date ('YYYY-MM-DD'), None for unknown tracks.
+    """
+    albums = fetch_tracks_albums(sp_client, track_ids)
+    return {track_id: album and album['release_date'] for track_id, album in albums.items()}
+
+def fetch_albums_release_dates(sp_client, album_ids) -> dict:
+    """
+    Release dates of up to ALBUMS_BATCH_SIZE albums with a single /albums call.
+
+    Returns:
+    dict: album_id -> release date ('YYYY-MM-DD'), None for unknown albums.
+    """
+    response = call_with_backoff(sp_client.albums, album_ids)
+    release_dates = dict.fromkeys(album_ids)
+    for album_id, album in zip(album_ids, response['albums']):
+        if album is not None:
+            release_dates[album_id] = normalize_release_date(album['release_date'], album.get('release_date_precision'))
+    return release_dates
+
+def get_tracks_release_dates(sp_client, track_ids, batch_size: int = TRACKS_BATCH_SIZE, max_workers: int = 4,
+                             cache=None) -> dict:
+    """
+    Release dates of many tracks, using the multi-id endpoint and a small pool of threads.
+
+    With a cache (spotify_api_cache connection) only the ids without a fresh cached answer
+    are fetched. Tracks the API doesn't know are cached as negative answers; failed
+    requests (network errors, rate limit bans) are not cached so they are retried next run.
+
+    For tests the client can point to a local fake API by setting its URL prefix,
+    e.g. sp_client.prefix = "http://127.0.0.1:8000/v1/".
+
+    Parameters:
+    sp_client (spotipy.Spotify): The Spotify client.
+    track_ids (iterable): The track ids (duplicates are fetched once).
+    batch_size (int): Ids per request (at most TRACKS_BATCH_SIZE).
+    max_workers (int): Number of concurrent requests.
+    cache (sqlite3.Connection): Optional persistent cache from spotify_api_cache.open_api_cache.
+
+    Returns:
+    dict: track_id -> release date, None when unknown or the lookup failed.
+    """
+    unique_ids = list(dict.fromkeys(track_ids))
+    release_dates = {}
+    if cache is not None:
+        release_dates = spac.get_cached(cache, spac.TRACK_RELEASE_DATE, unique_ids)
+        unique_ids = [track_id for track_id in unique_ids if track_id not in release_dates]
+
+    batches = chunk_ids(unique_ids, min(batch_size, TRACKS_BATCH_SIZE))
+    fetch_batch = lambda batch: fetch_tracks_release_dates(sp_client, batch)
+    for batch, batch_dates in run_batches(fetch_batch, batches, max_workers):
+        if batch_dates is None:
+            release_dates.update(dict.fromkeys(batch))
+            continue
+        release_dates.update(batch_dates)
+        if cache is not None:
+            spac.set_cached(cache, spac.TRACK_RELEASE_DATE, batch_dates)
+    return release_dates
+
+def get_albums_release_dates(sp_client, album_ids, max_workers: int = 4, cache=None, failed=None) -> dict:
+    """
+    Release dates of many albums with the multi-id /albums endpoint (ALBUMS_BATCH_SIZE ids per call).
+
+    Parameters:
+    sp_client (spotipy.Spotify): The Spotify client.
+    album_ids (iterable): The album ids (duplicates are fetched once).
+    max_workers (int): Number of concurrent requests.
+    cache (sqlite3.Connection): Optional persistent cache from spotify_api_cache.open_api_cache.
+    failed (set): Optional set the ids of the failed requests are added to.
+
+    Returns:
+    dict: album_id -> release date, None when unknown or the lookup failed.
+    """
+    unique_ids = list(dict.fromkeys(album_ids))
+    release_dates = {}
+    if cache is not None:
+        release_dates = spac.get_cached(cache, spac.ALBUM_RELEASE_DATE, unique_ids)
+        unique_ids = [album_id for album_id in unique_ids if album_id not in release_dates]
+
+    fetch_batch = lambda batch: fetch_albums_release_dates(sp_client, batch)
+    for batch, batch_dates in run_batches(fetch_batch, chunk_ids(unique_ids, ALBUMS_BATCH_SIZE), max_workers):
+        if batch_dates is None:
+            release_dates.update(dict.fromkeys(batch))
+            if failed is not None:
+                failed.update(batch)
+            continue
+        release_dates.update(batch_dates)
+        if cache is not None:
+            spac.set_cached(cache, spac.ALBUM_RELEASE_DATE, batch_dates)
+    return release_dates
+
+def get_release_dates_by_album(sp_client, df: pd.DataFrame, max_workers: int = 4, cache=None) -> dict:
+    """
+    Release dates of the tracks of df, fetching each album once instead of each track.
+
+    The release date is an album property, so:
+    - with a 'track_album_id' column, the albums are fetched directly with /albums;
+    - otherwise tracks are grouped by ('album_name', 'track_artist') as a local hint, one
+      track per group is fetched with /tracks (which returns its album id and date) and
+      the date is fanned out to the whole group. The hint -> album id mapping is cached,
+      so new tracks of an already known album cost no request. When the representative
+      is unknown, the other tracks of its group are fetched by their own id.
+    As with get_tracks_release_dates, the tracks the API doesn't know are cached as negative
+    answers and the tracks of failed requests are not cached, so they are retried next run.
+
+    Parameters:
+    sp_client (spotipy.Spotify): The Spotify client.
+    df (pd.DataFrame): DataFrame with 'track_id' and either 'track_album_id' or 'album_name' + 'track_artist'.
+    max_workers (int): Number of concurrent requests.
+    cache (sqlite3.Connection): Optional persistent cache from spotify_api_cache.open_api_cache.
+
+    Returns:
+    dict: track_id -> release date, None when unknown or the lookup failed.
+    """
+    tracks = df.dropna(subset=['track_id']).drop_duplicates(subset='track_id')
+    release_dates = {}
+    if cache is not None:
+        release_dates = spac.get_cached(cache, spac.TRACK_RELEASE_DATE, tracks['track_id'])
+        tracks = tracks[~tracks['track_id'].isin(release_dates.keys())]
+    if tracks.empty:
+        return release_dates
+
+    album_dates = {}
+    # Tracks /tracks answered null for (not the ones of failed requests)
+    unknown_tracks = set()
+    if 'track_album_id' in tracks.columns:
+        album_ids = tracks['track_album_id']
+    else:
+        hints = tracks['album_name'].astype(str) + '\x1f' + tracks['track_artist'].astype(str)
+        hint_albums = spac.get_cached(cache, spac.ALBUM_HINT, hints) if cache is not None else {}
+        hint_albums = {hint: album_id for hint, album_id in hint_albums.items() if album_id is not None}
+
+        # One representative track per album hint not resolved yet
+        unresolved = ~hints.isin(hint_albums.keys())
+        representatives = tracks.loc[unresolved, 'track_id'].groupby(hints[unresolved], sort=False).first()
+        hint_of = dict(zip(representatives.values, representatives.index))
+        unknown_hints = set()
+
+        fetch_batch = lambda batch: fetch_tracks_albums(sp_client, batch)
+        batches = chunk_ids(representatives.values, TRACKS_BATCH_SIZE)
+        for batch, batch_albums in run_batches(fetch_batch, batches, max_workers):
+            if batch_albums is None:
+                continue
+            # Only the found albums are cached: an unknown representative says nothing about its group
+            resolved = {hint_of[track_id]: album['album_id'] for track_id, album in batch_albums.items()
+                        if album and album['album_id']}
+            unknown_hints.update(hint_of[track_id] for track_id in batch_albums if hint_of[track_id] not in resolved)
+            unknown_tracks.update(track_id for track_id, album in batch_albums.items() if album is None)
+            batch_dates = {album['album_id']: album['release_date'] for album in batch_albums.values() if album}
+            hint_albums.update(resolved)
+            album_dates.update(batch_dates)
+            if cache is not None:
+                spac.set_cached(cache, spac.ALBUM_HINT, resolved)
+                spac.set_cached(cache, spac.ALBUM_RELEASE_DATE, batch_dates)
+
+        # The other tracks of the groups with an unknown representative, by their own id
+        track_albums = {}
+        retry = hints.isin(unknown_hints) & ~tracks['track_id'].isin(hint_of.keys())
+        batches = chunk_ids(tracks.loc[retry, 'track_id'], TRACKS_BATCH_SIZE)
+        for batch, batch_albums in run_batches(fetch_batch, batches, max_workers):
+            if batch_albums is None:
+                continue
+            batch_dates = {album['album_id']: album['release_date'] for album in batch_albums.values() if album}
+            track_albums.update({track_id: album['album_id'] for track_id, album in batch_albums.items() if album})
+            unknown_tracks.update(track_id for track_id, album in batch_albums.items() if album is None)
+            album_dates.update(batch_dates)
+            if cache is not None:
+                spac.set_cached(cache, spac.ALBUM_RELEASE_DATE, batch_dates)
+        album_ids = hints.map(hint_albums).fillna(tracks['track_id'].map(track_albums))
+
+    # Albums whose date is not known yet (cached hints, or given album ids) come from /albums
+    missing_albums = [album_id for album_id in album_ids.dropna().unique() if album_id not in album_dates]
+    failed_albums = set()
+    album_dates.update(get_albums_release_dates(sp_client, missing_albums, max_workers=max_workers, cache=cache,
+                                                failed=failed_albums))
+
+    track_dates = {}
+    for track_id, album_id in zip(tracks['track_id'], album_ids):
+        no_album = album_id is None or pd.isna(album_id)
+        if no_album and track_id in unknown_tracks:
+            # Unknown to the API: cached as a negative answer
+            track_dates[track_id] = None
+        elif no_album or album_id in failed_albums:
+            # Failed request: not cached so it's retried
+            release_dates[track_id] = None
+        else:
+            track_dates[track_id] = album_dates.get(album_id)
+    if cache is not None:
+        spac.set_cached(cache, spac.TRACK_RELEASE_DATE, track_dates)
+    release_dates.update(track_dates)
+    return release_dates
+
+def add_release_dates(df: pd.DataFrame, sp_client, by_album: bool = True, **kwargs) -> pd.DataFrame:
+    """
+    Add a 'release_date' column to the DataFrame with the bulk lookup of its track ids.
+
+    Parameters:
+    df (pd.DataFrame): DataFrame with a 'track_id' column.
+    sp_client (spotipy.Spotify): The Spotify client.
+    by_album (bool): Fetch each album once (see get_release_dates_by_album) when df has the album columns.
+    **kwargs: Passed to get_release_dates_by_album / get_tracks_release_dates.
+
+    Returns:
+    pd.DataFrame: A copy of df with the 'release_date' column.
+    """
+    has_album_columns = 'track_album_id' in df.columns or {'album_name', 'track_artist'} <= set(df.columns)
+    if by_album and has_album_columns:
+        release_dates = get_release_dates_by_album(sp_client, df, **kwargs)
+    else:
+        release_dates = get_tracks_release_dates(sp_client, df['track_id'].dropna().unique(), **kwargs)
+    df = df.copy()
+    df['release_date'] = df['track_id'].map(release_dates)
+    return df
+
 def get_track_release_date(sp_client, track_id):
     try:
         track = sp_client.track(track_id)
-        track_release_date = track['album']['release_date']
-        # If the release date is only the year, force the format to year-01-01
-        if len(track_release_date) == 4:
-            track_release_date = f"{track_release_date}-01-01"
-        return track_release_date
+        return normalize_release_date(track['album']['release_date'])
     except Exception:
         return None
 
@@ -8,6 +8,18 @@ sys.path.append(current_dir)
 
 import visualization_code
 import spotify_dataframe_functions as sdf
+import spotify_cache
+import spotify_filter_engine as sfe
+import spotify_indexes as sidx
+import spotify_embeddings as semb
+import spotify_model_registry as smr
+import spotify_hit_scoring as shs
+import spotify_similarity as ssim
+import spotify_cube as scube
+import spotify_trendlines as strend
+import spotify_figure_cache as sfc
+import spotify_precompute as spre
+import spotify_fingerprint as sfp
 
 st.set_page_config(page_title="The Hit-Science", layout="wide", page_icon="🎵")
 
@@ -41,16 +53,79 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Memory budget of the filtered views shared by all sessions
+VIEW_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+# Maximum number of tracks listed by the track search box
+TRACK_SEARCH_LIMIT = 1000
+
+# Train the models / fit the projections of the default view and the top genres in
+# background processes after the data is loaded (spotify_precompute)
+BACKGROUND_PRECOMPUTE = True
+
+# The plot_* figures are cached in memory by their inputs (spotify_figure_cache);
+# set to True to also keep them on disk across restarts
+FIGURE_DISK_CACHE = False
+if FIGURE_DISK_CACHE:
+    sfc.enable_disk_cache(sdf.cache_dir / "figures")
+
 # Load Data
-def load_data():
+# cache_resource keeps one copy of the data per process, shared by every session.
+# The fingerprint is part of the key, so a new CSV (or pipeline code) reloads it.
+@st.cache_resource(max_entries=1, show_spinner="Loading dataset...")
+def load_data(fingerprint):
     return sdf.prepare_spotify_data()
 
+@st.cache_resource(max_entries=1)
+def get_filter_context(fingerprint, _df):
+    return sfe.build_filter_context(_df)
+
+@st.cache_resource(max_entries=1)
+def get_spotify_indexes(fingerprint, _df):
+    return sidx.build_spotify_indexes(_df)
+
+@st.cache_resource(max_entries=1)
+def get_tsne_embedding(fingerprint, _df):
+    # Only load (or extend) a stored projection, the full fit runs offline: python src/spotify_embeddings.py
+    return semb.get_tsne_embedding(_df, fingerprint, build=False)
+
+@st.cache_resource(max_entries=1, show_spinner="Building the similarity index...")
+def get_similarity_index(fingerprint, _df):
+    return ssim.get_similarity_index(_df, fingerprint)
+
+@st.cache_resource(max_entries=1)
+def get_data_cube(fingerprint, _df):
+    cube = scube.get_data_cube(_df, fingerprint)
+    return cube, scube.build_cube_context(cube)
+
+@st.cache_resource(max_entries=1)
+def get_precompute_manager(fingerprint, _df):
+    # The cache only keeps the manager of the current data: stop the workers of the previous
+    # one, cache_resource drops it without shutting its process pool down
+    spre.shutdown_managers()
+    manager = spre.PrecomputeManager(fingerprint)
+    manager.start(_df)
+    return manager
+
+@st.cache_resource
+def get_view_cache():
+    return spotify_cache.MemoryLRUCache(max_bytes=VIEW_CACHE_MAX_BYTES)
+
 try:
-    df = load_data()
+    data_fingerprint = sdf.get_dataset_fingerprint()
+    df = load_data(data_fingerprint)
 except Exception as e:
     st.error(f"Error loading data: {e}")
     st.stop()
 
+# Unfiltered data, shared by every session (read-only)
+base_df = df
+filter_context = get_filter_context(data_fingerprint, df)
+spotify_indexes = get_spotify_indexes(data_fingerprint, df)
+data_cube, cube_context = get_data_cube(data_fingerprint, df)
+view_cache = get_view_cache()
+precompute = get_precompute_manager(data_fingerprint, df) if BACKGROUND_PRECOMPUTE else None
+
 # Visualization Render Functions
 
 # Module A
@@ -83,7 +158,7 @@ def render_vis_2(df):
 
 def render_vis_3(df):
     st.subheader("Genre Market Share vs. Impact Treemap 🗺️")
-    fig = visualization_code.plot_genre_market_share_treemap(df)
+    fig = visualization_code.plot_genre_market_share_treemap(df, cube=view_cube)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Compare genre size vs. average success.  
@@ -135,7 +210,8 @@ def render_vis_6(df):
 
 def render_vis_7(df):
     st.subheader("The 'Loudness War' Regression 📈🔊")
-    fig = visualization_code.plot_loudness_war_regression(df)
+    trendline = strend.get_trendline(df, 'loudness', 'track_popularity', segment_key=view_key())
+    fig = visualization_code.plot_loudness_war_regression(df, trendline=trendline)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Check if louder songs are still more popular, even with normalization.  
@@ -147,7 +223,7 @@ def render_vis_7(df):
 
 def render_vis_8(df):
     st.subheader("The '30-Second Rule' Duration Decay Curve ⏱️")
-    fig = visualization_code.plot_duration_decay_curve(df)
+    fig = visualization_code.plot_duration_decay_curve(df, cube=view_cube)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** See how song length affects popularity.  
@@ -223,7 +299,7 @@ def render_vis_12(df):
 # Module C
 def render_vis_13(df):
     st.subheader("The 'Camelot Wheel' Key & Mode Heatmap 🎡")
-    fig = visualization_code.plot_camelot_wheel_heatmap(df)
+    fig = visualization_code.plot_camelot_wheel_heatmap(df, cube=view_cube)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** See which keys and modes are most popular for hits.  
@@ -247,7 +323,7 @@ def render_vis_14(df):
 
 def render_vis_15(df):
     st.subheader("Time Signature Stability Gauge ⏲️")
-    fig = visualization_code.plot_time_signature_gauge(df)
+    fig = visualization_code.plot_time_signature_gauge(df, cube=view_cube)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Show which time signatures dominate the charts.  
@@ -259,7 +335,8 @@ def render_vis_15(df):
 
 def render_vis_16(df):
     st.subheader("Liveness vs. Popularity Inverse Curve 🎤")
-    fig = visualization_code.plot_liveness_vs_popularity(df)
+    trendline = strend.get_trendline(df, 'liveness', 'track_popularity', segment_key=view_key())
+    fig = visualization_code.plot_liveness_vs_popularity(df, trendline=trendline)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** See if "live" sounding tracks do well.  
@@ -271,7 +348,7 @@ def render_vis_16(df):
 
 def render_vis_17(df):
     st.subheader("Explicit Ratio by Genre (Stacked Bar) 🚫")
-    fig = visualization_code.plot_explicit_ratio_by_genre(df)
+    fig = visualization_code.plot_explicit_ratio_by_genre(df, cube=view_cube)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Show how explicit content varies by genre.  
@@ -283,8 +360,18 @@ def render_vis_17(df):
 
 def render_vis_18(df):
     st.subheader("The 'Hit Potential' Cluster Map (t-SNE) 🗺️✨")
-    st.info("Generating map... simple sampling used for performance.")
-    fig = visualization_code.plot_hit_potential_tsne(df)
+    embedding = get_tsne_embedding(data_fingerprint, base_df)
+    embedding_status = precompute.status('embedding') if precompute is not None else None
+    if embedding is None and embedding_status == 'done' and precompute.wait('embedding', timeout=0):
+        # The background worker has stored the projection since the last (cached) lookup
+        get_tsne_embedding.clear()
+        embedding = get_tsne_embedding(data_fingerprint, base_df)
+    if embedding is None and embedding_status == 'pending':
+        st.info("The full catalog map is being prepared in the background... a quick projection of a sample is shown meanwhile.")
+    elif embedding is None:
+        st.info("Generating map... simple sampling used for performance (no stored projection of the "
+                "full catalog: run python src/spotify_embeddings.py to precompute it).")
+    fig = visualization_code.plot_hit_potential_tsne(df, embedding=embedding)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Group songs by audio similarity and hit status.  
@@ -296,7 +383,22 @@ def render_vis_18(df):
 
 def render_vis_19(df):
     st.subheader("Feature Importance Waterfall Chart 💧")
-    fig = visualization_code.plot_feature_importance_waterfall(df)
+    if precompute is not None:
+        # Models not trained yet are queued in the background, never fitted in the script thread
+        segments = smr.get_importance_segments(df, base_df)
+        missing = smr.get_missing_segments(base_df, data_fingerprint, segments)
+        in_flight = precompute.pending(precompute.queue_importances(missing))
+        if in_flight:
+            st.info(f"The popularity models of this view are being trained in the background "
+                    f"({len(segments) - len(in_flight)}/{len(segments)} ready).")
+            if not st.button("Wait for the models", key="wait_importances"):
+                return
+            with st.spinner("Training the popularity models..."):
+                for task_name in in_flight:
+                    precompute.wait(task_name)
+    with st.spinner("Loading the popularity models..."):
+        importances = smr.get_feature_importances(df, base_df, data_fingerprint)
+    fig = visualization_code.plot_feature_importance_waterfall(df, importances=importances)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Show which features matter most for predicting popularity.  
@@ -309,10 +411,17 @@ def render_vis_19(df):
 def render_vis_20(df):
     st.subheader("The 'Distance to Hit' Gauge 🎯")
 
-    track = st.sidebar.selectbox("Select Track for Hit Distance", sorted(df['track_name'].unique())[:1000])
+    # Prefix search over the whole catalog (restricted to the filtered tracks) using the track name index
+    track_query = st.sidebar.text_input(
+        "Search Track for Hit Distance",
+        help="Type the beginning of a track name to search the full catalog"
+    )
+    track_options = sidx.search_prefix(spotify_indexes, 'track_name', track_query, limit=TRACK_SEARCH_LIMIT, df=df)
+    track = st.sidebar.selectbox("Select Track for Hit Distance", track_options, key="hit_distance_track")
     if not track:
         track = df['track_name'].iloc[0]
-    fig = visualization_code.plot_distance_to_hit_gauge(df, track)
+    reference = shs.get_hit_reference(df, segment_key=view_key())
+    fig = visualization_code.plot_distance_to_hit_gauge(df, track, indexes=spotify_indexes, reference=reference)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("""
 :dart: **Goal:** Score how close a song is to the "hit" formula.  
@@ -322,6 +431,53 @@ def render_vis_20(df):
 :shield: **Strategic Insight:** Know if your song is "algorithm ready" or a bold outlier.
 """)
 
+def render_vis_21(df):
+    st.subheader("Closest to Hit: Ranked Tracks 🏁")
+    # Every track of the view is scored at once; the scores are cached per filter combination
+    ranked = shs.rank_closest_to_hit(df, top_k=20, segment_key=view_key())
+    st.dataframe(ranked, use_container_width=True, hide_index=True)
+    st.markdown("""
+:dart: **Goal:** Find the non-hit tracks that sound the most like a hit.  
+:clipboard: **Chart Type:** Ranked table.  
+ 🤔: **Logic:** Same "Distance to Hit" score as the gauge, computed for every track of the selection.  
+:secret: **The Hidden Secret:** Many near-hits are a small tweak away from the hit formula.  
+:rocket: **Strategic Insight:** Shortlist these tracks for playlists and promotion.
+""")
+
+def render_vis_22(df):
+    st.subheader("Sounds Like: Nearest Tracks 🎧")
+    # Same track as the gauge (sidebar selection)
+    track = st.session_state.get("hit_distance_track") or df['track_name'].iloc[0]
+    target = sidx.lookup_rows(df, spotify_indexes, 'track_name', track)
+    if target.empty:
+        st.info("Track not found in the current selection.")
+        return
+
+    similarity_index = get_similarity_index(data_fingerprint, base_df)
+    similar = ssim.find_similar_tracks(similarity_index, target['track_id'].iloc[0], k=10)
+    positions = [sidx.lookup_positions(spotify_indexes, 'track_id', track_id)[0] for track_id in similar['track_id']]
+    details = base_df.iloc[positions][['track_name', 'track_artist', 'track_genre', 'track_popularity']]
+    st.dataframe(details.assign(distance=similar['distance'].to_numpy()), use_container_width=True, hide_index=True)
+    st.markdown("""
+:dart: **Goal:** Find the tracks of the whole catalog that sound the most like the selected one.  
+:clipboard: **Chart Type:** Ranked table.  
+ 🤔: **Logic:** Nearest neighbours in the (standardized) audio features of the t-SNE map, from a KD-tree index.  
+:secret: **The Hidden Secret:** Sound-alikes often come from genres you would not expect.  
+:link: **Strategic Insight:** Use them for playlist pitching and "fans also like" targeting.
+""")
+
+@st.fragment
+def render_fragment(render_function, df):
+    render_function(df)
+
+def render_isolated(render_function, df):
+    # The charts below the fold run as fragments: their own widgets (e.g. "Wait for the
+    # models") only rerun them, not the whole page. They are still drawn on every full run,
+    # the figure cache (spotify_figure_cache) is what keeps those reruns cheap.
+    # The container gives each fragment its own position, hence its own id.
+    with st.container():
+        render_fragment(render_function, df)
+
 # Navigation Structure
 # --------------------------------------------------------------------------
 # STORYTELLING WRAPPERS (Grouping Visualizations for Narrative Flow)
@@ -350,9 +506,9 @@ def render_story_hit_formula(df):
     st.info("What audio features actually correlate with success? (Data & ML Insights)")
     render_vis_2(df)
     st.markdown("---")
-    render_vis_19(df)
+    render_isolated(render_vis_19, df)
     st.markdown("---")
-    render_vis_7(df)
+    render_isolated(render_vis_7, df)
 
 def render_story_song_vibes(df):
     st.markdown("### 🎵 Song Architecture & Vibe")
@@ -396,7 +552,11 @@ def render_story_track_analyzer(df):
     with col2:
         render_vis_20(df)
     st.markdown("---")
-    render_vis_18(df)
+    render_isolated(render_vis_21, df)
+    st.markdown("---")
+    render_isolated(render_vis_22, df)
+    st.markdown("---")
+    render_isolated(render_vis_18, df)
 
 # Navigation Structure
 NAV_STRUCTURE = {
@@ -426,6 +586,41 @@ selected_app = st.sidebar.radio("2. Select Visualization", list(NAV_STRUCTURE[se
 st.sidebar.markdown("---")
 st.sidebar.title("Data Filters")
 
+# The filters only combine boolean masks over precomputed codes (spotify_filter_engine);
+# the DataFrame is sliced once at the end. The final view and the option lists are
+# cached under the normalized filters applied so far, so going back to a previous
+# combination is instant. Cached views are shared between sessions: never modify them.
+filter_spec = {}
+filter_mask = sfe.full_mask(filter_context)
+
+def filter_key():
+    return (data_fingerprint,) + sfe.normalize_filter_spec(filter_spec)
+
+def view_key():
+    # Content hash of the filtered rows: the trendlines and hit scores are shared by every
+    # filter combination giving the same rows, and survive a data update that doesn't touch them
+    return view_cache.get_or_set(
+        filter_key() + (('fingerprint',),),
+        lambda: sfp.rows_fingerprint(base_df, filter_mask, index=True)
+    )
+
+def apply_step(step, value):
+    global filter_mask
+    filter_spec[step] = value
+    filter_mask = sfe.apply_filter_step(filter_context, filter_mask, step, value)
+
+def cached_options(column):
+    return view_cache.get_or_set(
+        filter_key() + (('options', column),),
+        lambda: sfe.filter_options(filter_context, filter_mask, column)
+    )
+
+def cached_unique_count(column):
+    return view_cache.get_or_set(
+        filter_key() + (('nunique', column),),
+        lambda: sfe.count_unique(filter_context, filter_mask, column)
+    )
+
 # 0. Popularity Range Filter
 if 'track_popularity' in df.columns:
     min_pop = int(df['track_popularity'].min())
@@ -437,79 +632,74 @@ if 'track_popularity' in df.columns:
         max_value=max_pop,
         value=(min_pop, max_pop)
     )
-    df = df[(df['track_popularity'] >= popularity_range[0]) & (df['track_popularity'] <= popularity_range[1])]
+    if popularity_range != (min_pop, max_pop):
+        apply_step('popularity_range', popularity_range)
 
 # 1. Track Genre Filter
 if 'track_genre' in df.columns:
-    available_genres = sorted(df['track_genre'].dropna().unique())
+    available_genres = cached_options('track_genre')
     selected_genres = st.sidebar.multiselect(
         "Track Genre",
         options=available_genres,
         help="Leave empty to include all genres"
     )
-
-    if selected_genres:
-        df = df[df['track_genre'].isin(selected_genres)]
+    apply_step('genres', selected_genres)
 
 # 2. Select top genre filter, as default is all genres
 if 'track_genre' in df.columns:
+    n_genres = cached_unique_count('track_genre')
     top_n_genres = st.sidebar.number_input(
         "Number of Top Genres to Show (Global Filter)",
         min_value=1,
-        max_value=len(df['track_genre'].unique()),
-        value=len(df['track_genre'].unique()),
+        max_value=max(n_genres, 1),
+        value=max(n_genres, 1),
         step=1,
         help="Show only the top N genres by track count"
     )
-    top_genres = (
-        df['track_genre']
-        .value_counts()
-        .nlargest(top_n_genres)
-        .index.tolist()
-    )
-    df = df[df['track_genre'].isin(top_genres)]
+    if top_n_genres < n_genres:
+        apply_step('top_n_genres', top_n_genres)
 
 #3. Artist Filter
 if 'track_artist' in df.columns:
-    available_artists = sorted(df['track_artist'].dropna().unique())
+    available_artists = cached_options('track_artist')
     selected_artists = st.sidebar.multiselect(
         "Artist Name",
         options=available_artists,
         help="Leave empty to include all artists"
     )
-
-    if selected_artists:
-        df = df[df['track_artist'].isin(selected_artists)]
+    apply_step('artists', selected_artists)
 
 # 4. Select top artist filter, as default is all artists
 if 'track_artist' in df.columns:
+    n_artists = cached_unique_count('track_artist')
     top_n_artists = st.sidebar.number_input(
         "Number of Top Artists to Show (Global Filter)",
         min_value=1,
-        max_value=len(df['track_artist'].unique()),
-        value=len(df['track_artist'].unique()),
+        max_value=max(n_artists, 1),
+        value=max(n_artists, 1),
         step=1,
         help="Show only the top N artists by track count"
     )
-    top_artists = (
-        df['track_artist']
-        .value_counts()
-        .nlargest(top_n_artists)
-        .index.tolist()
-    )
-    df = df[df['track_artist'].isin(top_artists)]
+    if top_n_artists < n_artists:
+        apply_step('top_n_artists', top_n_artists)
 
 #5. Select Track
 if 'track_name' in df.columns:
-    available_tracks = sorted(df['track_name'].dropna().unique())
+    available_tracks = cached_options('track_name')
     selected_tracks = st.sidebar.multiselect(
         "Track Name",
         options=available_tracks,
         help="Leave empty to include all tracks"
     )
-
-    if selected_tracks:
-        df = df[df['track_name'].isin(selected_tracks)]
+    apply_step('tracks', selected_tracks)
+
+df = view_cache.get_or_set(filter_key(), lambda: sfe.materialize(df, filter_mask))
+# Cells of the aggregate cube matching the filters (None with an artist or track filter, or a
+# popularity range that cuts a bucket: the charts scan the rows)
+view_cube = view_cache.get_or_set(
+    filter_key() + (('cube',),),
+    lambda: scube.slice_cube(data_cube, filter_spec, context=cube_context)
+)
 
 
 # Render Application
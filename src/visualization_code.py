@@ -3,12 +3,55 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 import plotly.figure_factory as ff
-from scipy import stats
+from plotly.subplots import make_subplots
 from sklearn.manifold import TSNE
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from sklearn.preprocessing import StandardScaler
+
+import spotify_indexes as sidx
+import spotify_hit_scoring as shs
+import spotify_cube as scube
+import spotify_binning as sbin
+import spotify_summary_stats as sstats
+import spotify_trendlines as strend
+from spotify_figure_cache import cached_figure
+
+# Scatter charts switch to WebGL above this many points (SVG freezes the browser on large scatters)
+WEBGL_THRESHOLD = 1000
+# Points drawn at most by a scatter chart
+SCATTER_POINT_BUDGET = 50000
+
+def build_scatter(df, x, y, point_budget=SCATTER_POINT_BUDGET, keep_mask=None, **scatter_kwargs):
+    """
+    Shared scatter builder: density-aware downsample to the point budget (the rows of
+    keep_mask, e.g. the hits, and the outliers are drawn first), then px.scatter with
+    WebGL rendering above WEBGL_THRESHOLD points.
+    """
+    if keep_mask is not None:
+        keep_mask = np.asarray(keep_mask, dtype=bool)
+    chart_df = sbin.budget_sample(df, x, y, point_budget, keep_mask=keep_mask)
+    render_mode = 'webgl' if len(chart_df) > WEBGL_THRESHOLD else 'svg'
+    return px.scatter(chart_df, x=x, y=y, render_mode=render_mode, **scatter_kwargs)
+
+# Precomputed box plots: Plotly only gets the quartiles/whiskers and a sample of the outliers
+# of each box (spotify_summary_stats), not every row.
+def box_traces(box_stats, x_column, name, color, offsetgroup=None, showlegend=True):
+    outlier_x = np.repeat(box_stats[x_column].to_numpy(), box_stats['outliers'].map(len).to_numpy())
+    outlier_y = np.concatenate(box_stats['outliers'].tolist()) if len(box_stats) else []
+    box = go.Box(
+        x=box_stats[x_column], q1=box_stats['q1'], median=box_stats['median'], q3=box_stats['q3'],
+        lowerfence=box_stats['lowerfence'], upperfence=box_stats['upperfence'],
+        name=str(name), marker_color=color, offsetgroup=offsetgroup, legendgroup=str(name),
+        showlegend=showlegend
+    )
+    outliers = go.Scatter(
+        x=outlier_x, y=outlier_y, mode='markers', name=str(name), marker=dict(color=color, size=4),
+        offsetgroup=offsetgroup, legendgroup=str(name), showlegend=False
+    )
+    return [box, outliers]
 
 #1. The Global Popularity Histogram
+@cached_figure
 def plot_global_popularity_histogram(df):
     title_suffix = ""
     chart_df = df
@@ -17,10 +60,13 @@ def plot_global_popularity_histogram(df):
     
     fig = go.Figure()
 
-    # Histogram
-    fig.add_trace(go.Histogram(
-        x=popularity_data,
-        xbins=dict(start=0, end=100, size=2),
+    # Histogram, binned here so only the 50 bars are sent to the browser
+    bin_size = 2
+    binned = sbin.histogram_1d(popularity_data.to_numpy(), sbin.regular_edges(0, 100, 100 // bin_size))
+    fig.add_trace(go.Bar(
+        x=binned['centers'],
+        y=binned['counts'],
+        width=bin_size,
         marker_color='rgba(0, 80, 0, 0.8)',  # dark green
         name='Song Count',
         hovertemplate='Popularity: %{x}<br>Count: %{y}<extra></extra>'
@@ -29,9 +75,9 @@ def plot_global_popularity_histogram(df):
     # KDE Overlay
     if len(popularity_data) > 1:
         try:
-            kde = stats.gaussian_kde(popularity_data)
+            # Binned FFT KDE, same bandwidth (Scott) as scipy's gaussian_kde at a fraction of the cost
             x_range = np.linspace(0, 100, 200)
-            kde_values = kde(x_range)
+            kde_values = sbin.binned_kde(popularity_data.to_numpy(), x_range)
             # Scale factor: approximate count to match histogram height
             scale_factor = len(popularity_data) * 2
             scaled_kde = kde_values * scale_factor
@@ -74,6 +120,7 @@ def plot_global_popularity_histogram(df):
     return fig
 
 #2. The "Hit Formula" Correlation Matrix
+@cached_figure
 def plot_hit_formula_correlation_matrix(df):
     cols = ['track_popularity', 'danceability', 'energy', 'valence', 'loudness', 
             'acousticness', 'instrumentalness', 'speechiness', 'tempo', 'duration_ms']
@@ -94,15 +141,21 @@ def plot_hit_formula_correlation_matrix(df):
     return fig
 
 #3. Genre Market Share vs. Impact Treemap
-def plot_genre_market_share_treemap(df):
+@cached_figure
+def plot_genre_market_share_treemap(df, cube=None):
     # Aggregating data
     if 'track_genre' not in df.columns:
          return go.Figure().add_annotation(text="No Genre Data", showarrow=False)
          
-    genre_stats = df.groupby('track_genre').agg(
-        Count=('track_id', 'count'),
-        Avg_Pop=('track_popularity', 'mean')
-    ).reset_index()
+    if cube is not None:
+        # Roll up the pre-aggregated cells of the view instead of scanning the rows
+        genre_stats = scube.rollup(cube, ['track_genre']).rename(
+            columns={'count': 'Count', 'popularity_mean': 'Avg_Pop'})[['track_genre', 'Count', 'Avg_Pop']]
+    else:
+        genre_stats = df.groupby('track_genre', observed=True).agg(
+            Count=('track_id', 'count'),
+            Avg_Pop=('track_popularity', 'mean')
+        ).reset_index()
     
     fig = px.treemap(
         genre_stats,
@@ -119,6 +172,7 @@ def plot_genre_market_share_treemap(df):
     return fig
 
 #4. Artist Dominance "Bubble Swarm"
+@cached_figure
 def plot_artist_dominance_bubble_swarm(df):
     if 'track_artist' not in df.columns:
         return go.Figure()
@@ -131,13 +185,13 @@ def plot_artist_dominance_bubble_swarm(df):
         m = x.mode()
         return m[0] if not m.empty else (x.iloc[0] if len(x) > 0 else "Unknown")
         
-    chart_df = df[df['track_artist'].isin(top_artists)].groupby('track_artist').agg(
+    chart_df = df[df['track_artist'].isin(top_artists)].groupby('track_artist', observed=True).agg(
         Track_Count=('track_id', 'count'),
         Avg_Pop=('track_popularity', 'mean'),
         Primary_Genre=('track_genre', get_mode_genre)
     ).reset_index()
     
-    fig = px.scatter(
+    fig = build_scatter(
         chart_df,
         x='Avg_Pop',
         y='Track_Count',
@@ -156,6 +210,7 @@ def plot_artist_dominance_bubble_swarm(df):
     return fig
 
 #5. The Explicit Content Popularity Split
+@cached_figure
 def plot_explicit_content_popularity_split(df, selected_genre=None):
     # if selected_genre and selected_genre != "All Genres":
     #     chart_df = df[df['track_genre'] == selected_genre]
@@ -166,30 +221,33 @@ def plot_explicit_content_popularity_split(df, selected_genre=None):
 
     chart_df = df
 
-    fig = px.box(
-        chart_df,
-        x='track_genre',
-        y='track_popularity',
-        color='explicit',
+    color_map = {True: '#FF5555', False: "#03B300"}
+    box_stats = sstats.box_stats(chart_df, 'track_popularity', ['explicit', 'track_genre'])
+    fig = go.Figure()
+    for explicit, explicit_stats in box_stats.groupby('explicit', sort=False):
+        for trace in box_traces(explicit_stats, 'track_genre', explicit, color_map.get(explicit), offsetgroup=str(explicit)):
+            fig.add_trace(trace)
+    fig.update_layout(
         title="<b>Explicit Content Popularity Split</b>",
-        color_discrete_map={True: '#FF5555', False: "#03B300"}
+        boxmode="group", scattermode="group", legend_title_text="explicit"
     )
     fig.update_layout(template="plotly_dark", xaxis_title="Genre", yaxis_title="track_popularity")
     return fig
 
 #6. The "Sad Banger" Quadrant (Hexbin Plot)
+@cached_figure
 def plot_sad_banger_hexbin(df):
-    fig = px.density_heatmap(
-        df,
-        x="valence",
-        y="energy",
-        z="track_popularity",
-        histfunc="avg",
-        nbinsx=20,
-        nbinsy=20,
-        color_continuous_scale="Greens",
-        title="<b>The 'Sad Banger' Quadrant</b> (Avg Popularity)"
-    )
+    # Average popularity per cell, binned server side: the payload is a 20x20 grid whatever the row count
+    grid = sbin.bin_frame(df, 'valence', 'energy', n_bins=20, weights='track_popularity')
+    fig = go.Figure(go.Heatmap(
+        x=grid['x_centers'],
+        y=grid['y_centers'],
+        z=grid['means'],
+        colorscale="Greens",
+        colorbar=dict(title="avg of track_popularity"),
+        hovertemplate='valence=%{x}<br>energy=%{y}<br>avg of track_popularity=%{z}<extra></extra>'
+    ))
+    fig.update_layout(title="<b>The 'Sad Banger' Quadrant</b> (Avg Popularity)")
     
     # Quadrant Labels
     fig.add_annotation(x=0.9, y=0.9, text="Happy/Energetic", showarrow=False, font=dict(color="white"))
@@ -201,31 +259,39 @@ def plot_sad_banger_hexbin(df):
     return fig
 
 #7. The "Loudness War" Regression
-def plot_loudness_war_regression(df):
-    chart_df = df.sample(5000) if len(df) > 5000 else df
-    
-    fig = px.scatter(
-        chart_df,
+@cached_figure
+def plot_loudness_war_regression(df, trendline=None):
+    # trendline: precomputed LOWESS curve of the whole view (spotify_trendlines.get_trendline)
+    if trendline is None:
+        trendline = strend.get_trendline(df, 'loudness', 'track_popularity')
+    # The points are downsampled to the budget (hits first), the trendline is fitted on every row
+    fig = build_scatter(
+        df,
         x="loudness",
         y="track_popularity",
-        trendline="lowess",
-        trendline_color_override="#1DB954",
+        keep_mask=df['track_popularity'] > shs.HIT_THRESHOLD,
         opacity=0.3,
         title="<b>The 'Loudness War' Regression</b>"
     )
+    fig.add_trace(go.Scatter(x=trendline['x'], y=trendline['y'], mode='lines', name='LOWESS trendline',
+                             line=dict(color="#1DB954"), showlegend=False))
     
     fig.add_vline(x=-14, line_width=2, line_dash="dash", line_color="red", annotation_text="Spotify Norm (-14dB)")
     fig.update_layout(template="plotly_dark", xaxis_title="Loudness (dB)", yaxis_title="track_popularity")
     return fig
 
 #8. The "30-Second Rule" Duration Decay Curve
-def plot_duration_decay_curve(df):
-    # Avoid SettingWithCopy
-    df_c = df.copy()
-    df_c['duration_sec'] = df_c['duration_ms'] / 1000
-    df_c['duration_bin'] = (df_c['duration_sec'] // 15) * 15 
-    
-    agg_df = df_c.groupby('duration_bin')['track_popularity'].mean().reset_index()
+@cached_figure
+def plot_duration_decay_curve(df, cube=None):
+    if cube is not None:
+        agg_df = scube.rollup(cube, ['duration_bin']).rename(columns={'popularity_mean': 'track_popularity'})
+    else:
+        # Avoid SettingWithCopy
+        df_c = df.copy()
+        df_c['duration_sec'] = df_c['duration_ms'] / 1000
+        df_c['duration_bin'] = (df_c['duration_sec'] // 15) * 15 
+
+        agg_df = df_c.groupby('duration_bin')['track_popularity'].mean().reset_index()
     agg_df = agg_df[agg_df['duration_bin'] < 600] 
     
     fig = px.area(
@@ -240,36 +306,50 @@ def plot_duration_decay_curve(df):
     return fig
 
 #9. The Rhythm Profile (Tempo Density)
+@cached_figure
 def plot_tempo_density_ridgeline(df, top_n=10):
     # top_genres = df['track_genre'].value_counts().head(top_n).index
     # chart_df = df[df['track_genre'].isin(top_genres)]
 
     chart_df = df
     
-    fig = px.violin(
-        chart_df,
-        y="track_genre",
-        x="tempo",
-        color="track_genre",
-        orientation="h",
-        #side="positive",
-        points=False, # cleaner look
-        title="<b>The Rhythm Profile (Tempo)</b>"
+    # Violins drawn from per-genre KDE curves computed here (filled go.Scatter), same width for every genre
+    curves = sstats.violin_curves(chart_df, 'tempo', 'track_genre')
+    colors = px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for position, (genre, (x, density)) in enumerate(curves.items()):
+        half_width = 0.45 * density / density.max()
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([x, x[::-1]]),
+            y=np.concatenate([position + half_width, (position - half_width)[::-1]]),
+            fill='toself', mode='lines', name=str(genre),
+            line=dict(color=colors[position % len(colors)], width=1),
+            hoveron='fills', hoverinfo='name'
+        ))
+    fig.update_layout(
+        title="<b>The Rhythm Profile (Tempo)</b>",
+        yaxis=dict(tickvals=list(range(len(curves))), ticktext=[str(g) for g in curves], title="track_genre")
     )
     fig.update_layout(template="plotly_dark", showlegend=False, xaxis_title="BPM")
     return fig
 
 #10. "Organic vs. Synthetic" Density Map
+@cached_figure
 def plot_organic_vs_synthetic_density(df):
-    fig = px.density_heatmap(
-        df,
-        x="acousticness",
-        y="energy",
-        nbinsx=20,
-        nbinsy=20,
-        color_continuous_scale="Inferno",
+    # Track count per cell, binned server side
+    grid = sbin.bin_frame(df, 'acousticness', 'energy', n_bins=20)
+    fig = go.Figure(go.Heatmap(
+        x=grid['x_centers'],
+        y=grid['y_centers'],
+        z=grid['counts'],
+        colorscale="Inferno",
+        colorbar=dict(title="count"),
+        hovertemplate='Acousticness (Natural/Raw)=%{x}<br>Energy (Processed/Intense)=%{y}<br>count=%{z}<extra></extra>'
+    ))
+    fig.update_layout(
         title="<b>Production Style: Acoustic vs. Energy</b>",
-        labels={"acousticness": "Acousticness (Natural/Raw)", "energy": "Energy (Processed/Intense)"}
+        xaxis_title="Acousticness (Natural/Raw)",
+        yaxis_title="Energy (Processed/Intense)"
     )
     
     # Add quadrant annotations for context
@@ -283,18 +363,20 @@ def plot_organic_vs_synthetic_density(df):
     return fig
 
 #11. Speechiness Threshold Indicator
+@cached_figure
 def plot_speechiness_threshold_boxplot(df, top_n=10):
     top_genres = df['track_genre'].value_counts().head(top_n).index
     chart_df = df[df['track_genre'].isin(top_genres)]
     
-    fig = px.box(
-        chart_df,
-        x="track_genre",
-        y="speechiness",
-        color="track_genre",
-        title="<b>Speechiness Threshold Indicator</b>",
-        color_discrete_sequence=px.colors.sequential.Greens
-    )
+    box_stats = sstats.box_stats(chart_df, 'speechiness', ['track_genre'])
+    colors = px.colors.sequential.Greens
+    fig = go.Figure()
+    # One trace per genre, like px.box with color="track_genre"
+    for i in range(len(box_stats)):
+        genre_stats = box_stats.iloc[[i]]
+        for trace in box_traces(genre_stats, 'track_genre', genre_stats['track_genre'].iloc[0], colors[i % len(colors)]):
+            fig.add_trace(trace)
+    fig.update_layout(title="<b>Speechiness Threshold Indicator</b>", legend_title_text="track_genre")
     
     fig.add_hrect(y0=0.66, y1=1.0, fillcolor="blue", opacity=0.5, layer="below", annotation_text="Spoken Word")
     fig.add_hrect(y0=0.33, y1=0.66, fillcolor="blue", opacity=0.4, layer="below", annotation_text="Rap/Rhythmic")
@@ -304,6 +386,7 @@ def plot_speechiness_threshold_boxplot(df, top_n=10):
     return fig
 
 #12. Sonic Radar
+@cached_figure
 def plot_sonic_radar(df):
     
     #if df has only one row change track_name to the track name of that row
@@ -360,16 +443,26 @@ def plot_sonic_radar(df):
     return fig
 
 #13. Camelot Wheel Heatmap
-def plot_camelot_wheel_heatmap(df):
+@cached_figure
+def plot_camelot_wheel_heatmap(df, cube=None):
     key_mapping = {
         0: 'C', 1: 'C#', 2: 'D', 3: 'D#', 4: 'E', 5: 'F', 
         6: 'F#', 7: 'G', 8: 'G#', 9: 'A', 10: 'A#', 11: 'B'
     }
-    df_c = df.copy()
-    df_c['key_name'] = df_c['key'].map(key_mapping)
-    df_c['mode_name'] = df_c['mode'].map({1: 'Major', 0: 'Minor'})
-    
-    grouped = df_c.groupby(['mode_name', 'key_name'])['track_popularity'].mean().reset_index()
+    if cube is not None:
+        # Mean per mode x key from the cube cells, the names are mapped on 24 rows only
+        grouped = scube.rollup(cube, ['mode', 'key'])
+        grouped['mode_name'] = grouped['mode'].map({1: 'Major', 0: 'Minor'})
+        grouped['key_name'] = grouped['key'].map(key_mapping)
+        grouped = grouped.rename(columns={'popularity_mean': 'track_popularity'})
+        grouped = grouped.dropna(subset=['mode_name', 'key_name']).sort_values(['mode_name', 'key_name'])
+        grouped = grouped[['mode_name', 'key_name', 'track_popularity']].reset_index(drop=True)
+    else:
+        df_c = df.copy()
+        df_c['key_name'] = df_c['key'].map(key_mapping)
+        df_c['mode_name'] = df_c['mode'].map({1: 'Major', 0: 'Minor'})
+
+        grouped = df_c.groupby(['mode_name', 'key_name'], observed=True)['track_popularity'].mean().reset_index()
     
     fig = px.sunburst(
         grouped,
@@ -383,28 +476,32 @@ def plot_camelot_wheel_heatmap(df):
     return fig
 
 #14. Genre Feature Boxplots
+@cached_figure
 def plot_genre_specific_feature_boxplots(df):
     top_genres = df['track_genre'].value_counts().head(5).index
     chart_df = df[df['track_genre'].isin(top_genres)]
     
-    melted = chart_df.melt(id_vars=['track_genre'], value_vars=['danceability', 'energy', 'valence', 'acousticness'])
+    features = ['danceability', 'energy', 'valence', 'acousticness']
     
-    fig = px.box(
-        melted,
-        x="track_genre",
-        y="value",
-        color="track_genre",
-        facet_col="variable",
-        title="<b>Genre-Specific Feature Distribution</b>",
-        color_discrete_sequence=["#1DB954"]  # Spotify green
-        #color_discrete_sequence=px.colors.sequential.Greens  # Spectrum of green
-    )
+    # One facet per feature, boxes from precomputed stats
+    fig = make_subplots(rows=1, cols=len(features), shared_yaxes=True,
+                        subplot_titles=[f"variable={feature}" for feature in features])
+    for col, feature in enumerate(features, start=1):
+        box_stats = sstats.box_stats(chart_df, feature, ['track_genre'])
+        for trace in box_traces(box_stats, 'track_genre', feature, "#1DB954"):  # Spotify green
+            fig.add_trace(trace, row=1, col=col)
+    fig.update_layout(title="<b>Genre-Specific Feature Distribution</b>", yaxis_title="value")
     fig.update_layout(template="plotly_dark", showlegend=False)
     return fig
 
 #15. Time Signature Gauge
-def plot_time_signature_gauge(df):
-    counts = df['time_signature'].value_counts(normalize=True).reset_index()
+@cached_figure
+def plot_time_signature_gauge(df, cube=None):
+    if cube is not None:
+        counts = scube.rollup(cube, ['time_signature']).set_index('time_signature')['count']
+        counts = (counts[counts > 0] / counts.sum()).sort_values(ascending=False).reset_index()
+    else:
+        counts = df['time_signature'].value_counts(normalize=True).reset_index()
     counts.columns = ['Signature', 'Percentage']
     
     fig = px.treemap(
@@ -419,30 +516,38 @@ def plot_time_signature_gauge(df):
     return fig
 
 #16. Liveness vs. Popularity
-def plot_liveness_vs_popularity(df):
-    chart_df = df.sample(2000) if len(df) > 2000 else df
-    
-    fig = px.scatter(
-        chart_df,
+@cached_figure
+def plot_liveness_vs_popularity(df, trendline=None):
+    if trendline is None:
+        trendline = strend.get_trendline(df, 'liveness', 'track_popularity')
+    fig = build_scatter(
+        df,
         x="liveness",
         y="track_popularity",
-        trendline="lowess",
-        trendline_color_override="Black",
+        keep_mask=df['track_popularity'] > shs.HIT_THRESHOLD,
         opacity=0.4,
         title="<b>Liveness vs. Popularity</b>",
         color_discrete_sequence=["#1DB954"]  # Spotify green
     )
+    fig.add_trace(go.Scatter(x=trendline['x'], y=trendline['y'], mode='lines', name='LOWESS trendline',
+                             line=dict(color="Black"), showlegend=False))
     fig.update_layout(template="plotly_dark")
     return fig
 
 #17. Explicit Ratio by Genre
-def plot_explicit_ratio_by_genre(df):
-    top_genres = df['track_genre'].value_counts().head(20).index
-    chart_df = df[df['track_genre'].isin(top_genres)]
-    
-    grouped = chart_df.groupby(['track_genre', 'explicit']).size().reset_index(name='count')
+@cached_figure
+def plot_explicit_ratio_by_genre(df, cube=None):
+    if cube is not None:
+        genre_explicit = scube.rollup(cube, ['track_genre', 'explicit'])
+        top_genres = genre_explicit.groupby('track_genre', observed=True)['count'].sum().sort_values(ascending=False).head(20).index
+        grouped = genre_explicit[genre_explicit['track_genre'].isin(top_genres)][['track_genre', 'explicit', 'count']].reset_index(drop=True)
+    else:
+        top_genres = df['track_genre'].value_counts().head(20).index
+        chart_df = df[df['track_genre'].isin(top_genres)]
+
+        grouped = chart_df.groupby(['track_genre', 'explicit'], observed=True).size().reset_index(name='count')
     # Normalize to 100% stack
-    totals = grouped.groupby('track_genre')['count'].transform('sum')
+    totals = grouped.groupby('track_genre', observed=True)['count'].transform('sum')
     grouped['percentage'] = grouped['count'] / totals
     
     fig = px.bar(
@@ -457,32 +562,44 @@ def plot_explicit_ratio_by_genre(df):
     return fig
 
 #18. t-SNE
-def plot_hit_potential_tsne(df):
-    sample_size = 500
-    if len(df) > sample_size:
-        chart_df = df.sample(sample_size, random_state=42).copy()
+@cached_figure
+def plot_hit_potential_tsne(df, embedding=None):
+    if embedding is not None:
+        # Precomputed projection of the full catalog: only filter and plot it
+        # (build_scatter downsamples it to the point budget)
+        chart_df = df.drop_duplicates(subset='track_id')
+        chart_df = chart_df[chart_df['track_id'].isin(embedding.index)]
+        coordinates = embedding.loc[chart_df['track_id'], ['tsne_1', 'tsne_2']].to_numpy()
+        chart_df = chart_df.copy()
+        chart_df['tsne_1'] = coordinates[:, 0]
+        chart_df['tsne_2'] = coordinates[:, 1]
     else:
-        chart_df = df.copy()
+        sample_size = 500
+        if len(df) > sample_size:
+            chart_df = df.sample(sample_size, random_state=42).copy()
+        else:
+            chart_df = df.copy()
 
-    features = ['danceability', 'energy', 'valence', 'acousticness', 'loudness', 'tempo']
-    # Handle missing
-    X = chart_df[features].fillna(0)
-    
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    tsne = TSNE(n_components=2, random_state=42, perplexity=30)
-    projections = tsne.fit_transform(X_scaled)
-    
-    chart_df['tsne_1'] = projections[:, 0]
-    chart_df['tsne_2'] = projections[:, 1]
+        features = ['danceability', 'energy', 'valence', 'acousticness', 'loudness', 'tempo']
+        # Handle missing
+        X = chart_df[features].fillna(0)
+
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+
+        tsne = TSNE(n_components=2, random_state=42, perplexity=30)
+        projections = tsne.fit_transform(X_scaled)
+
+        chart_df['tsne_1'] = projections[:, 0]
+        chart_df['tsne_2'] = projections[:, 1]
     
     chart_df['Pop_Tier'] = pd.cut(chart_df['track_popularity'], bins=[-1, 30, 70, 100], labels=['Niche', 'Mid', 'Hit'])
     
-    fig = px.scatter(
+    fig = build_scatter(
         chart_df,
         x='tsne_1',
         y='tsne_2',
+        keep_mask=chart_df['Pop_Tier'] == 'Hit',
         color='Pop_Tier',
         hover_data=['track_name', 'track_artist'],
         title="<b>'Hit Potential' Audio Landscape (t-SNE)</b>",
@@ -492,17 +609,23 @@ def plot_hit_potential_tsne(df):
     return fig
 
 #19. Feature Importance
-def plot_feature_importance_waterfall(df):
+@cached_figure
+def plot_feature_importance_waterfall(df, importances=None):
     features = ['danceability', 'energy', 'valence', 'loudness', 'acousticness', 'instrumentalness', 'speechiness', 'tempo', 'duration_ms', 'liveness']
-    chart_df = df.dropna(subset=features + ['track_popularity']).sample(min(1000, len(df)))
-    
-    X = chart_df[features]
-    y = chart_df['track_popularity']
-    
-    model = RandomForestRegressor(n_estimators=50, max_depth=5, random_state=42)
-    model.fit(X, y)
-    
-    importances = model.feature_importances_
+
+    if importances is not None:
+        # Precomputed importances (spotify_model_registry), no training at render time
+        importances = importances.reindex(features).fillna(0).to_numpy()
+    else:
+        chart_df = df.dropna(subset=features + ['track_popularity']).sample(min(1000, len(df)), random_state=42)
+
+        X = chart_df[features]
+        y = chart_df['track_popularity']
+
+        model = RandomForestRegressor(n_estimators=50, max_depth=5, random_state=42)
+        model.fit(X, y)
+
+        importances = model.feature_importances_
     sorted_idx = np.argsort(importances)
     
     fig = go.Figure(go.Waterfall(
@@ -520,37 +643,24 @@ def plot_feature_importance_waterfall(df):
     return fig
 
 #20. Distance to Hit Gauge
-def plot_distance_to_hit_gauge(df, track_name):
-    hits = df[df['track_popularity'] > 75]
-    if hits.empty:
-         hits = df[df['track_popularity'] > 60] 
-         
-    features = ['danceability', 'energy', 'valence', 'acousticness', 'loudness']
-    
-    if hits.empty:
+@cached_figure(ignore=('indexes',))
+def plot_distance_to_hit_gauge(df, track_name, indexes=None, reference=None):
+    # reference: precomputed hit centroid/range of df (spotify_hit_scoring.get_hit_reference)
+    if reference is None:
+        reference = shs.compute_hit_reference(df)
+
+    if reference is None:
         return go.Figure().add_annotation(text="Not enough hits data")
-        
-    hit_centroid = hits[features].mean()
-    
-    target = df[df['track_name'] == track_name]
+
+    # Use the prebuilt track name index when available instead of scanning df
+    if indexes is not None:
+        target = sidx.lookup_rows(df, indexes, 'track_name', track_name)
+    else:
+        target = df[df['track_name'] == track_name]
     if target.empty:
         return go.Figure().add_annotation(text="Track not found")
 
-    target_vals = target[features].iloc[0]
-    
-    # Scale for distance calc
-    scaler = MinMaxScaler()
-    # Fit on all + specific track to cover range
-    combined = pd.concat([hits[features], target[features]])
-    scaler.fit(combined)
-    
-    centroid_scaled = scaler.transform([hit_centroid])[0]
-    target_scaled = scaler.transform([target_vals])[0]
-    
-    dist = np.linalg.norm(centroid_scaled - target_scaled)
-    # Max possible Euclidean dist in 5D hypercube is sqrt(5) ~= 2.236
-    max_dist = np.sqrt(len(features))
-    score = max(0, 100 * (1 - (dist / max_dist))) 
+    score = shs.score_tracks(target.iloc[[0]], reference).iloc[0]
     
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+import spotify_binning as sbin
+
+# Largest error accepted, relative to the peak of the exact density
+KDE_TOLERANCE = 1e-3
+
+
+def normal_sample():
+    return np.random.default_rng(0).normal(50, 12, 5000)
+
+
+def two_peak_sample():
+    rng = np.random.default_rng(1)
+    return np.concatenate([rng.normal(20, 5, 3000), rng.normal(70, 8, 2000)])
+
+
+def uniform_sample():
+    return np.random.default_rng(2).uniform(0, 100, 5000)
+
+
+def popularity_sample():
+    # Integer values with many ties, as plotted by the popularity histogram
+    df = pd.read_csv(ROOT_DIR / "dataset_spotify_with_release_dates.csv", usecols=['track_popularity'])
+    return df['track_popularity'].to_numpy(dtype='float64')
+
+
+@pytest.mark.parametrize("bw_method", ['scott', 'silverman'])
+@pytest.mark.parametrize("make_sample", [normal_sample, two_peak_sample, uniform_sample, popularity_sample])
+def test_binned_kde_matches_gaussian_kde(make_sample, bw_method):
+    values = make_sample()
+    eval_points = np.linspace(0, 100, 200)
+
+    expected = stats.gaussian_kde(values, bw_method=bw_method)(eval_points)
+    result = sbin.binned_kde(values, eval_points, bw_method=bw_method)
+
+    assert np.max(np.abs(result - expected)) <= KDE_TOLERANCE * expected.max()
+
+
+def test_binned_kde_ignores_nan():
+    values = normal_sample()
+    eval_points = np.linspace(0, 100, 50)
+    with_nan = np.concatenate([values, [np.nan, np.nan]])
+
+    np.testing.assert_allclose(sbin.binned_kde(with_nan, eval_points), sbin.binned_kde(values, eval_points))
+
+
+@pytest.mark.parametrize("values", [np.full(100, 42.0), np.array([7.0]), np.array([])])
+def test_binned_kde_rejects_constant_input(values):
+    with pytest.raises(ValueError):
+        sbin.binned_kde(values, np.linspace(0, 100, 10))
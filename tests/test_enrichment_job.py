@@ -0,0 +1,63 @@
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+import spotify_api_cache as spac
+import spotify_enrichment_job as sej
+
+# Every track is its own album; the ids ending with 'x' are unknown to the API
+TRACK_IDS = [f"t{i}" for i in range(8)] + ["t8x", "t9x"]
+
+
+class StubSpotify:
+    """
+    The /tracks endpoint of spotipy.Spotify, recording the requested ids. Raises
+    KeyboardInterrupt on the call number interrupt_at, like a job stopped halfway.
+    """
+
+    def __init__(self, interrupt_at=None):
+        self.requested = Counter()
+        self.n_calls = 0
+        self.interrupt_at = interrupt_at
+
+    def tracks(self, track_ids):
+        self.n_calls += 1
+        if self.n_calls == self.interrupt_at:
+            raise KeyboardInterrupt
+        self.requested.update(track_ids)
+        return {'tracks': [None if t.endswith('x') else {'album': {'id': f"album_{t}", 'release_date': '2020-05-01'}}
+                           for t in track_ids]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    conn = spac.open_api_cache(tmp_path / "api_cache.sqlite")
+    yield conn
+    conn.close()
+
+
+def tracks_df():
+    return pd.DataFrame({'track_id': TRACK_IDS, 'album_name': TRACK_IDS, 'track_artist': 'Artist'})
+
+
+def test_resumed_job_requests_each_id_once(cache, tmp_path):
+    client = StubSpotify(interrupt_at=3)
+    with pytest.raises(KeyboardInterrupt):
+        sej.run_release_date_job(client, tracks_df(), batch_size=4, cache=cache, max_workers=1, job_root=tmp_path)
+
+    # Resume with the same client, then run the finished job once more
+    client.interrupt_at = None
+    sej.run_release_date_job(client, tracks_df(), batch_size=4, cache=cache, max_workers=1, job_root=tmp_path)
+    result = sej.run_release_date_job(client, tracks_df(), batch_size=4, cache=cache, max_workers=1,
+                                      job_root=tmp_path)
+
+    assert set(client.requested) == set(TRACK_IDS)
+    assert max(client.requested.values()) == 1
+    assert result['release_date'].notna().sum() == 8
+    assert result.loc[result['track_id'].str.endswith('x'), 'release_date'].isna().all()
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+import spotify_api_cache as spac
+import spotipy_api_extract_engine as spse
+
+# track_id -> album_id known to the stub API
+CATALOG = {'a1': 'A', 'a2': 'A', 'b2': 'B', 'c1': 'C'}
+ALBUM_DATES = {'A': '2001', 'B': '2002-02', 'C': '2003-03-03'}
+
+
+class StubSpotify:
+    """
+    The /tracks and /albums endpoints of spotipy.Spotify over CATALOG, recording the requested ids.
+    """
+
+    def __init__(self, failing_ids=()):
+        self.calls = []
+        self.failing_ids = set(failing_ids)
+
+    def _album(self, album_id):
+        return {'id': album_id, 'release_date': ALBUM_DATES[album_id]}
+
+    def tracks(self, track_ids):
+        self.calls.append(('tracks', list(track_ids)))
+        if self.failing_ids & set(track_ids):
+            raise ConnectionError("stub network error")
+        return {'tracks': [{'album': self._album(CATALOG[t])} if t in CATALOG else None for t in track_ids]}
+
+    def albums(self, album_ids):
+        self.calls.append(('albums', list(album_ids)))
+        return {'albums': [self._album(a) if a in ALBUM_DATES else None for a in album_ids]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    conn = spac.open_api_cache(tmp_path / "api_cache.sqlite")
+    yield conn
+    conn.close()
+
+
+def album_tracks(track_ids):
+    # 'b1' and 'x1' are unknown to the API; 'b1' shares its album hint with 'b2'
+    albums = {'a1': 'Alpha', 'a2': 'Alpha', 'b1': 'Beta', 'b2': 'Beta', 'c1': 'Gamma', 'x1': 'Unknown'}
+    return pd.DataFrame({'track_id': track_ids, 'album_name': [albums[t] for t in track_ids],
+                         'track_artist': 'Artist'})
+
+
+def test_by_album_fans_out_album_dates(cache):
+    client = StubSpotify()
+    release_dates = spse.get_release_dates_by_album(client, album_tracks(['a1', 'a2', 'b1', 'b2', 'c1', 'x1']),
+                                                    cache=cache)
+
+    assert release_dates == {'a1': '2001-01-01', 'a2': '2001-01-01', 'b1': None, 'b2': '2002-02-01',
+                             'c1': '2003-03-03', 'x1': None}
+
+
+def test_by_album_caches_unknown_tracks(cache):
+    df = album_tracks(['a1', 'a2', 'b1', 'b2', 'c1', 'x1'])
+    spse.get_release_dates_by_album(StubSpotify(), df, cache=cache)
+
+    client = StubSpotify()
+    release_dates = spse.get_release_dates_by_album(client, df, cache=cache)
+
+    assert client.calls == []
+    assert release_dates['b1'] is None and release_dates['x1'] is None
+
+
+def test_by_album_retries_failed_requests(cache):
+    df = album_tracks(['a1', 'x1'])
+    first = spse.get_release_dates_by_album(StubSpotify(failing_ids={'x1'}), df, max_workers=1, cache=cache)
+    assert first == {'a1': None, 'x1': None}
+
+    client = StubSpotify()
+    second = spse.get_release_dates_by_album(client, df, cache=cache)
+
+    assert client.calls == [('tracks', ['a1', 'x1'])]
+    assert second == {'a1': '2001-01-01', 'x1': None}
+
+
+def test_tracks_caches_unknown_tracks(cache):
+    spse.get_tracks_release_dates(StubSpotify(), ['a1', 'x1'], cache=cache)
+
+    client = StubSpotify()
+    release_dates = spse.get_tracks_release_dates(client, ['a1', 'x1'], cache=cache)
+
+    assert client.calls == []
+    assert release_dates == {'a1': '2001-01-01', 'x1': None}